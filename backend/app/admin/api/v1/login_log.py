@@ -1,14 +1,19 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, Query, Request, Response
+from starlette.responses import StreamingResponse
 
 from backend.app.admin.schema.login_log import GetLoginLogListDetails
 from backend.app.admin.service.login_log_service import login_log_service
+from backend.common.enums import ExportFormatType
 from backend.common.pagination import DependsPagination, paging_data
 from backend.common.response.response_schema import ResponseModel, response_base
 from backend.common.security.jwt import DependsJwtAuth
 from backend.common.security.rbac import DependsRBAC
+from backend.crud.crud_login_log import login_log_generation
 from backend.database.db_postgres import CurrentSession
+from backend.utils.etag import etag_headers, etag_matches, generation_etag, not_modified
+from backend.utils.export import export_response, table_columns
 
 router = APIRouter(prefix="/login_log", tags=["Login log"] )
 
@@ -23,16 +28,39 @@ router = APIRouter(prefix="/login_log", tags=["Login log"] )
 )
 async def get_pagination_login_logs(
     request: Request,
+    response: Response,
     db: CurrentSession,
     username: Annotated[str | None, Query()] = None,
     status: Annotated[int | None, Query()] = None,
     ip: Annotated[str | None, Query()] = None,
 ) -> ResponseModel:
+    etag = await generation_etag(request, login_log_generation)
+    if etag:
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update(etag_headers(etag))
     log_select = await login_log_service.get_select(username=username, status=status, ip=ip)
     page_data = await paging_data(db, log_select, GetLoginLogListDetails)
     return response_base.success(request=request, data=page_data)
 
 
+@router.get(
+    '/export',
+    summary='Streaming export of login logs (NDJSON, CSV)',
+    dependencies=[
+        DependsJwtAuth,
+    ],
+)
+async def export_login_logs(
+    format: Annotated[ExportFormatType, Query()] = ExportFormatType.ndjson,
+    username: Annotated[str | None, Query()] = None,
+    status: Annotated[int | None, Query()] = None,
+    ip: Annotated[str | None, Query()] = None,
+) -> StreamingResponse:
+    log_select = await login_log_service.get_select(username=username, status=status, ip=ip)
+    return export_response(table_columns(log_select), format, 'login_log')
+
+
 @router.delete(
     '/',
     summary='(Batch) Delete Login Logs',
@@ -57,7 +85,6 @@ async def delete_login_log(request: Request, pk: Annotated[list[int], Query(...)
     ],
 )
 async def delete_all_login_logs(request: Request) -> ResponseModel:
-    count = await login_log_service.delete_all()
-    if count > 0:
+    if await login_log_service.delete_all():
         return response_base.success(request=request)
     return response_base.fail(request=request)
@@ -1,14 +1,19 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, Query, Request, Response
+from starlette.responses import StreamingResponse
 
 from backend.app.admin.schema.opera_log import GetOperaLogListDetails
 from backend.app.admin.service.opera_log_service import opera_log_service
+from backend.common.enums import ExportFormatType
 from backend.common.pagination import DependsPagination, paging_data
 from backend.common.response.response_schema import ResponseModel, response_base
 from backend.common.security.jwt import DependsJwtAuth
 from backend.common.security.rbac import DependsRBAC
+from backend.crud.crud_opera_log import opera_log_generation
 from backend.database.db_postgres import CurrentSession
+from backend.utils.etag import etag_headers, etag_matches, generation_etag, not_modified
+from backend.utils.export import export_response, table_columns
 
 router = APIRouter(prefix="/opera_log", tags=["Operation Log"])
 
@@ -23,16 +28,39 @@ router = APIRouter(prefix="/opera_log", tags=["Operation Log"])
 )
 async def get_pagination_opera_logs(
     request: Request,
+    response: Response,
     db: CurrentSession,
     username: Annotated[str | None, Query()] = None,
     status: Annotated[int | None, Query()] = None,
     ip: Annotated[str | None, Query()] = None,
 ) -> ResponseModel:
+    etag = await generation_etag(request, opera_log_generation)
+    if etag:
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response.headers.update(etag_headers(etag))
     log_select = await opera_log_service.get_select(username=username, status=status, ip=ip)
     page_data = await paging_data(db, log_select, GetOperaLogListDetails)
     return response_base.success(request=request, data=page_data)
 
 
+@router.get(
+    '/export',
+    summary='Streaming export of operation logs (NDJSON, CSV)',
+    dependencies=[
+        DependsJwtAuth,
+    ],
+)
+async def export_opera_logs(
+    format: Annotated[ExportFormatType, Query()] = ExportFormatType.ndjson,
+    username: Annotated[str | None, Query()] = None,
+    status: Annotated[int | None, Query()] = None,
+    ip: Annotated[str | None, Query()] = None,
+) -> StreamingResponse:
+    log_select = await opera_log_service.get_select(username=username, status=status, ip=ip)
+    return export_response(table_columns(log_select), format, 'opera_log')
+
+
 @router.delete(
     '/',
     summary='Delete (batch) operation logs',
@@ -55,7 +83,6 @@ async def delete_opera_log(request: Request, pk: Annotated[list[int], Query(...)
     ],
 )
 async def delete_all_opera_logs(request: Request) -> ResponseModel:
-    count = await opera_log_service.delete_all()
-    if count > 0:
+    if await opera_log_service.delete_all():
         return response_base.success(request=request)
     return response_base.fail(request=request)
@@ -12,14 +12,23 @@ from .....crud import veille as crud_veille
 from .....database.db_postgres import get_async_db
 from ...service import veille_service
 from .....common.security.jwt import DependsJwtAuth # La vraie dépendance de sécurité
-from ....tasks.veille import trigger_veille_task
+from ....tasks.veille import reanalyze_articles_task, trigger_veille_task
+from .....common.pagination import decode_keyset_cursor, encode_keyset_cursor
+from .....utils.serializers import MsgSpecJSONResponse
+from .....common.enums import ExportFormatType
+from .....utils.export import export_response
+from .....utils.etag import etag_headers, etag_matches, make_etag, not_modified
+from .....utils.timezone import timezone
+import msgspec
+from msgspec import json as msgspec_json
 
 
 # backend/app/admin/api/v1/veille.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional, cast
+from datetime import datetime, timedelta
+from typing import Any, List, Literal, Optional, Tuple, cast
 import asyncio
 from celery import Task
 
@@ -34,7 +43,8 @@ router.dependencies.append(DependsJwtAuth)
 
 @router.post("/run", status_code=202, summary="Lancer une nouvelle veille en arrière-plan (Admin)")
 def run_new_veille(
-    query: str = Query(..., min_length=3, description="Le sujet de la veille, ex: 'Tendances Fintech'")
+    query: str = Query(..., min_length=3, description="Le sujet de la veille, ex: 'Tendances Fintech'"),
+    shared: Optional[bool] = Query(None, description="Rattacher la requête au crawl partagé de la fenêtre courante (défaut: configuration)"),
     # Note : cette route est maintenant `def` et non `async def` car elle est instantanée.
     # Elle n'a pas besoin de `Depends(get_async_db)` car elle ne touche pas à la DB.
 ):
@@ -45,7 +55,7 @@ def run_new_veille(
     try:
         print(f"Envoi de la tâche de veille pour '{query}' à Celery.")
         # On délègue le travail à Celery. `.delay()` envoie la tâche au broker (Redis).
-        cast(Task,trigger_veille_task).delay(query)
+        cast(Task,trigger_veille_task).delay(query, shared)
         return {"message": "Tâche de veille lancée en arrière-plan. Les résultats seront disponibles via /articles dans ~30 minutes."}
     except Exception as e:
         # Gère le cas où le broker Celery/Redis est inaccessible
@@ -53,17 +63,235 @@ def run_new_veille(
         raise HTTPException(status_code=503, detail=f"Le service de tâches de fond est indisponible : {str(e)}")
 
 
-@router.get("/articles", response_model=List[veille_schema.ArticleResponse], summary="Lister les articles analysés (Admin)")
+@router.post("/reanalyze", status_code=202, summary="Ré-analyser les articles au prompt périmé (Admin)")
+def run_reanalysis(
+    reset: bool = Query(False, description="Ignorer le point de reprise et repartir du premier article"),
+    max_articles: Optional[int] = Query(None, gt=0, description="Nombre maximal d'articles traités par cette tâche"),
+):
+    """
+    Lance en arrière-plan la ré-analyse des articles produits par une ancienne version du prompt.
+    """
+    try:
+        cast(Task, reanalyze_articles_task).delay(reset, max_articles)
+        return {"message": f"Ré-analyse vers le prompt {veille_service.ANALYSIS_PROMPT_VERSION} lancée en arrière-plan."}
+    except Exception as e:
+        print(f"ERREUR : Impossible de contacter le broker Celery. {e}")
+        raise HTTPException(status_code=503, detail=f"Le service de tâches de fond est indisponible : {str(e)}")
+
+
+@router.get("/llm-usage", summary="Consommation LLM de l'analyse (Admin)")
+async def get_llm_usage(
+    days: int = Query(7, ge=1, le=366, description="Période couverte : les N derniers jours agrégés"),
+    group_by: List[Literal["day", "source", "model", "prompt_version", "length_bucket"]] = Query(
+        ["source"], description="Dimensions de regroupement (`length_bucket` : tranche de taille du contenu)"
+    ),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Tokens, latence, tentatives et échecs des appels LLM, agrégés chaque jour (`veille.rollup_llm_usage`)
+    et triés par tokens consommés : montre quelles sources et tailles de contenu dominent les coûts.
+    """
+    since = timezone.now().date() - timedelta(days=days)
+    rows = await crud_veille.get_llm_usage(db, since=since, group_by=list(dict.fromkeys(group_by)))
+    return MsgSpecJSONResponse({"since": since, "items": rows})
+
+
+def _parse_article_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Valide la projection `fields=` (liste de colonnes séparées par des virgules)."""
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    allowed = (*crud_veille.ARTICLE_LIST_FIELDS, *crud_veille.ARTICLE_OPTIONAL_FIELDS)
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Champs inconnus : {', '.join(unknown)}. Champs disponibles : {', '.join(allowed)}")
+    return requested
+
+
+def _parse_article_cursor(cursor: Optional[str], sort: str) -> Optional[Tuple[Any, int]]:
+    """Décode le curseur ; la clé de tri est un score (`score`) ou une date ISO (`recent`)."""
+    if not cursor:
+        return None
+    try:
+        key, article_id = decode_keyset_cursor(cursor)
+        if not isinstance(article_id, int):
+            raise ValueError(cursor)
+        if key is not None:
+            if sort == "recent":
+                key = datetime.fromisoformat(key)
+            elif not isinstance(key, int):
+                raise ValueError(cursor)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide.")
+    return key, article_id
+
+
+def _parse_analysis_contains(analysis_contains: Optional[str]) -> Optional[dict]:
+    if not analysis_contains:
+        return None
+    try:
+        value = msgspec_json.decode(analysis_contains)
+    except msgspec.DecodeError:
+        value = None
+    if not isinstance(value, dict):
+        raise HTTPException(status_code=400, detail="`analysis_contains` doit être un objet JSON.")
+    return value
+
+
+async def _cached_response(request: Request, name: str, params: dict, loader) -> Response:
+    """
+    Réponse servie depuis le cache Redis, avec ETag dérivé de la clé de cache (génération + paramètres).
+    Si `If-None-Match` correspond, renvoie 304 sans lire ni sérialiser les données.
+    """
+    key = await crud_veille.article_cache.key_for(name, params)
+    headers = None
+    if key is not None:
+        etag = make_etag(key)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        headers = etag_headers(etag)
+    content = await crud_veille.article_cache.get_or_set(key, loader)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.get("/articles", summary="Lister les articles analysés (Admin)")
 async def get_articles(
+    request: Request,
     published: Optional[bool] = Query(None),
     score_min: Optional[int] = Query(None, ge=1, le=10),
+    score_max: Optional[int] = Query(None, ge=1, le=10),
+    impact_afrique: Optional[str] = Query(None, min_length=3, description="Texte recherché dans `analysis.impact_afrique`"),
+    analysis_contains: Optional[str] = Query(None, description="Objet JSON que `analysis` doit contenir, ex: {\"score_pertinence\": 8}"),
+    published_after: Optional[datetime] = Query(None, description="Publiés à partir de cette date (incluse)"),
+    published_before: Optional[datetime] = Query(None, description="Publiés avant cette date (exclue)"),
+    days: Optional[int] = Query(None, ge=1, le=366, description="Raccourci : publiés dans les N derniers jours"),
+    sort: Literal["score", "recent"] = Query("score", description="`score` : pertinence décroissante, `recent` : plus récents d'abord"),
+    size: int = Query(20, gt=0, le=100, description="Nombre d'articles par page"),
+    cursor: Optional[str] = Query(None, description="Valeur `next_cursor` de la page précédente"),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules. `content` et `analysis` ne sont renvoyés que s'ils sont demandés."),
     db: AsyncSession = Depends(get_async_db)
 ):
     """
-    Récupère les articles de la base de données. Rapide et sécurisé.
+    Récupère une page d'articles, triés par pertinence ou par date de publication décroissante.
+    La réponse est sérialisée par msgspec et mise en cache dans Redis (clé : filtres, page et projection).
     """
-    articles = await crud_veille.get_articles(db=db, published=published, score_min=score_min)
-    return articles
+    field_list = _parse_article_fields(fields)
+    after = _parse_article_cursor(cursor, sort)
+    contains = _parse_analysis_contains(analysis_contains)
+    # Dates sans fuseau : interprétées dans le fuseau de l'application
+    if published_after and published_after.tzinfo is None:
+        published_after = published_after.replace(tzinfo=timezone.tz_info)
+    if published_before and published_before.tzinfo is None:
+        published_before = published_before.replace(tzinfo=timezone.tz_info)
+    cache_params = {
+        "published": published, "score_min": score_min, "score_max": score_max,
+        "impact_afrique": impact_afrique, "analysis_contains": contains,
+        "published_after": published_after, "published_before": published_before, "days": days,
+        "sort": sort, "size": size, "cursor": cursor, "fields": field_list,
+        # La fenêtre glissante `days` change de bornes chaque jour
+        "as_of": timezone.now().date() if days is not None else None,
+    }
+
+    async def load_page() -> dict:
+        since = published_after
+        if days is not None:
+            window_start = timezone.now() - timedelta(days=days)
+            since = max(since, window_start) if since else window_start
+        articles = await crud_veille.get_articles(
+            db=db,
+            published=published,
+            score_min=score_min,
+            score_max=score_max,
+            impact_afrique=impact_afrique,
+            analysis_contains=contains,
+            published_after=since,
+            published_before=published_before,
+            sort=sort,
+            limit=size + 1,
+            after=after,
+            fields=field_list,
+        )
+        next_cursor = None
+        if len(articles) > size:
+            articles = articles[:size]
+            last = articles[-1]
+            next_cursor = encode_keyset_cursor(last[crud_veille.ARTICLE_SORT_FIELDS[sort]], last["id"])
+        return {"items": articles, "size": size, "next_cursor": next_cursor}
+
+    return await _cached_response(request, "list", cache_params, load_page)
+
+
+@router.get("/articles/search", summary="Recherche plein texte dans les articles (Admin)")
+async def search_articles(
+    q: str = Query(..., min_length=2, description="Recherche, syntaxe web : mots, \"phrase exacte\", -exclusion, OR"),
+    lang: Literal["fr", "en"] = Query("fr", description="Configuration linguistique de la recherche"),
+    published: Optional[bool] = Query(None),
+    page: int = Query(1, ge=1, description="Numéro de page"),
+    size: int = Query(20, gt=0, le=100, description="Nombre d'articles par page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Recherche classée par pertinence, avec extraits surlignés (`<mark>`).
+    """
+    articles = await crud_veille.search_articles(
+        db=db, q=q, lang=lang, published=published, limit=size + 1, offset=size * (page - 1)
+    )
+    has_more = len(articles) > size
+    return MsgSpecJSONResponse({"items": articles[:size], "page": page, "size": size, "has_more": has_more})
+
+
+@router.get("/articles/export", summary="Exporter les articles en flux (NDJSON, CSV) (Admin)")
+async def export_articles(
+    format: ExportFormatType = Query(ExportFormatType.ndjson, description="Format du fichier exporté"),
+    published: Optional[bool] = Query(None),
+    score_min: Optional[int] = Query(None, ge=1, le=10),
+    fields: Optional[str] = Query(None, description="Colonnes à exporter, séparées par des virgules. `content` et `analysis` ne sont exportés que s'ils sont demandés."),
+):
+    """
+    Export complet lu par curseur serveur et émis par morceaux : mémoire constante quelle que soit la taille.
+    """
+    stmt = crud_veille.get_articles_export_select(
+        published=published, score_min=score_min, fields=_parse_article_fields(fields)
+    )
+    return export_response(stmt, format, "articles")
+
+
+@router.post("/articles/publish", response_model=veille_schema.BulkPublishStatusResponse, summary="Publier ou dépublier plusieurs articles (Admin)")
+async def bulk_publish_articles(
+    status: veille_schema.BulkPublishStatusUpdate,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Modifie le statut de publication d'un lot d'articles en une seule requête SQL.
+    La diffusion des articles publiés est enregistrée dans l'outbox (un seul message pour le lot).
+    """
+    requested_ids = list(dict.fromkeys(status.ids))
+    updated_ids = await crud_veille.bulk_update_publish_status(db, article_ids=requested_ids, published=status.published)
+
+    updated = set(updated_ids)
+    return veille_schema.BulkPublishStatusResponse(
+        published=status.published,
+        updated_ids=updated_ids,
+        unchanged_ids=[article_id for article_id in requested_ids if article_id not in updated],
+    )
+
+
+@router.get("/articles/{article_id}", response_model=veille_schema.ArticleDetailResponse, summary="Détail d'un article (Admin)")
+async def get_article(
+    request: Request,
+    article_id: int,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Récupère un article complet, contenu et analyse inclus (mis en cache dans Redis).
+    """
+    async def load_article() -> dict:
+        article = await crud_veille.get_article_by_id(db, article_id=article_id, with_body=True)
+        if not article:
+            raise HTTPException(status_code=404, detail="Article non trouvé.")
+        return veille_schema.ArticleDetailResponse.model_validate(article).model_dump()
+
+    return await _cached_response(request, "detail", {"id": article_id}, load_article)
 
 
 @router.post("/articles/{article_id}/publish", response_model=veille_schema.ArticleResponse, summary="Publier un article (Admin)")
@@ -74,15 +302,10 @@ async def publish_article(
 ):
     """
     Modifie le statut de publication d'un article. Rapide et sécurisé.
+    La diffusion est enregistrée dans l'outbox avec la publication, puis relayée à Celery (`outbox.relay`).
     """
     updated_article = await crud_veille.update_publish_status(db, article_id=article_id, published=status.published)
     if not updated_article:
         raise HTTPException(status_code=404, detail="Article non trouvé.")
-        
-    if status.published:
-        print(f"INFO: L'article {article_id} est maintenant marqué comme publié. Déclenchement de la diffusion...")
-        # C'est ici que vous pourriez lancer une AUTRE tâche Celery pour la publication sociale.
-        # from app.tasks.social import post_article_task
-        # post_article_task.delay(article_id)
 
     return updated_article
\ No newline at end of file
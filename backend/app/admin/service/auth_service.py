@@ -20,6 +20,7 @@ from backend.common.security.jwt import (
 )
 from backend.core.conf import settings
 from backend.database.db_postgres import async_db_session
+from backend.common.security.user_cache import current_user_cache
 from backend.database.db_redis import redis_client
 from backend.utils.timezone import timezone
 from backend.utils.translator import Translator
@@ -228,6 +229,7 @@ class AuthService:
         await redis_client.delete_prefix(key_prefix)
         key_prefix = f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{request.user.x_id}:'
         await redis_client.delete_prefix(key_prefix)
+        await current_user_cache.invalidate(request.user.x_id)
 
 
 auth_service = AuthService()
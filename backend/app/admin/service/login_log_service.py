@@ -4,7 +4,7 @@ from fastapi import Request
 from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.crud.crud_login_log import login_log_dao
+from backend.crud.crud_login_log import login_log_dao, login_log_generation
 from backend.app.admin.schema.login_log import CreateLoginLogParam
 from backend.common.log import log
 from backend.database.db_postgres import async_db_session
@@ -27,22 +27,26 @@ class LoginLogService:
         msg: str,
     ) -> None:
         try:
+            # Runs as a background task: resolving the location does not delay the response
+            client_info = request.state.client_info
+            location = await client_info.location()
             obj_in = CreateLoginLogParam(
                 user_x_id=user_x_id,
                 email=email,
                 status=status,
-                ip=request.state.ip,
-                country=request.state.country,
-                region=request.state.region,
-                city=request.state.city,
-                user_agent=request.state.user_agent,
-                browser=request.state.browser,
-                os=request.state.os,
-                device=request.state.device,
+                ip=client_info.ip,
+                country=location.country,
+                region=location.region,
+                city=location.city,
+                user_agent=client_info.user_agent,
+                browser=client_info.browser,
+                os=client_info.os,
+                device=client_info.device,
                 msg=msg,
                 login_time=login_time,
             )
             await login_log_dao.create(db, obj_in)
+            await login_log_generation.bump()
         except Exception as e:
             log.error(f'Login log creation failure: {e}')
 
@@ -50,13 +54,15 @@ class LoginLogService:
     async def delete(*, pk: list[int]) -> int:
         async with async_db_session.begin() as db:
             count = await login_log_dao.delete(db, pk)
-            return count
+        await login_log_generation.bump()
+        return count
 
     @staticmethod
-    async def delete_all() -> int:
+    async def delete_all() -> bool:
         async with async_db_session.begin() as db:
-            count = await login_log_dao.delete_all(db)
-            return count
+            deleted = await login_log_dao.delete_all(db)
+        await login_log_generation.bump()
+        return deleted
 
 
 login_log_service = LoginLogService()
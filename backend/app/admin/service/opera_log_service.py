@@ -1,6 +1,6 @@
 from sqlalchemy import Select
 
-from backend.crud.crud_opera_log import opera_log_dao
+from backend.crud.crud_opera_log import opera_log_dao, opera_log_generation
 from backend.app.admin.schema.opera_log import CreateOperaLogParam
 from backend.database.db_postgres import async_db_session
 
@@ -14,18 +14,27 @@ class OperaLogService:
     async def create(*, obj_in: CreateOperaLogParam):
         async with async_db_session.begin() as db:
             await opera_log_dao.create(db, obj_in)
+        await opera_log_generation.bump()
+
+    @staticmethod
+    async def create_many(*, objs: list[CreateOperaLogParam]):
+        async with async_db_session.begin() as db:
+            await opera_log_dao.create_many(db, objs)
+        await opera_log_generation.bump()
 
     @staticmethod
     async def delete(*, pk: list[int]) -> int:
         async with async_db_session.begin() as db:
             count = await opera_log_dao.delete(db, pk)
-            return count
+        await opera_log_generation.bump()
+        return count
 
     @staticmethod
-    async def delete_all() -> int:
+    async def delete_all() -> bool:
         async with async_db_session.begin() as db:
-            count = await opera_log_dao.delete_all(db)
-            return count
+            deleted = await opera_log_dao.delete_all(db)
+        await opera_log_generation.bump()
+        return deleted
 
 
 opera_log_service = OperaLogService()
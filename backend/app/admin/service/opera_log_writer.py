@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from backend.app.admin.schema.opera_log import CreateOperaLogParam
+from backend.app.admin.service.opera_log_service import OperaLogService
+from backend.common.log import log
+from backend.core.conf import settings
+from backend.utils.prometheus import (
+    OPERA_LOG_BATCH_SIZE,
+    OPERA_LOG_DROPPED,
+    OPERA_LOG_FLUSH_DURATION,
+    OPERA_LOG_QUEUE_DEPTH,
+    OPERA_LOG_WRITTEN,
+)
+
+
+class OperaLogWriter:
+    """
+    Batched writer of operation logs
+
+    Logs are queued in process and bulk-inserted by a background task once a batch is full or the
+    flush interval has elapsed: one session and one transaction per batch instead of per request.
+    When the queue is full, producers wait up to `full_wait` seconds (they run after the response,
+    never on the request path) and the log is then dropped and counted. The queue is drained on shutdown.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float, full_wait: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_wait = full_wait
+        self._queue: asyncio.Queue[CreateOperaLogParam] = asyncio.Queue(maxsize)
+        self._worker: asyncio.Task | None = None
+        self._stopping = False
+        OPERA_LOG_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    async def put(self, obj_in: CreateOperaLogParam) -> None:
+        """
+        Queue a log for writing, written immediately when the writer is not running
+
+        :param obj_in:
+        :return:
+        """
+        if self._worker is None or self._worker.done():
+            await self._write([obj_in])
+            return
+        try:
+            self._queue.put_nowait(obj_in)
+            return
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(self._queue.put(obj_in), self.full_wait)
+        except asyncio.TimeoutError:
+            OPERA_LOG_DROPPED.labels(reason='queue_full').inc()
+            log.warning('Opera log queue full, log dropped')
+
+    async def _next_batch(self) -> list[CreateOperaLogParam]:
+        try:
+            batch = [await asyncio.wait_for(self._queue.get(), self.flush_interval)]
+        except asyncio.TimeoutError:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._queue.empty():
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 or self._stopping:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: list[CreateOperaLogParam]) -> None:
+        start = time.perf_counter()
+        try:
+            await OperaLogService.create_many(objs=batch)
+        except Exception as e:
+            OPERA_LOG_DROPPED.labels(reason='write_error').inc(len(batch))
+            log.error(f'Opera log batch write failure ({len(batch)} logs): {e}')
+            return
+        OPERA_LOG_FLUSH_DURATION.observe(time.perf_counter() - start)
+        OPERA_LOG_BATCH_SIZE.observe(len(batch))
+        OPERA_LOG_WRITTEN.inc(len(batch))
+
+    async def _run(self) -> None:
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    def start(self) -> None:
+        """
+        Start the background writer
+
+        :return:
+        """
+        if self._worker is None:
+            self._stopping = False
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = settings.OPERA_LOG_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        """
+        Write the queued logs, then stop the background writer
+
+        :param timeout: Maximum time given to drain the queue
+        :return:
+        """
+        if self._worker is None:
+            return
+        self._stopping = True
+        try:
+            await asyncio.wait_for(self._worker, timeout)
+        except asyncio.TimeoutError:
+            OPERA_LOG_DROPPED.labels(reason='shutdown').inc(self._queue.qsize())
+            log.error(f'Opera log writer shutdown timed out, {self._queue.qsize()} logs dropped')
+        self._worker = None
+
+
+opera_log_writer = OperaLogWriter(
+    settings.OPERA_LOG_QUEUE_SIZE,
+    settings.OPERA_LOG_BATCH_SIZE,
+    settings.OPERA_LOG_FLUSH_INTERVAL_SECONDS,
+    settings.OPERA_LOG_QUEUE_FULL_WAIT_SECONDS,
+)
@@ -9,6 +9,7 @@ from backend.app.admin.schema.role import CreateRoleParam, UpdateRoleMenuParam,
 from backend.common.exception import errors
 from backend.core.conf import settings
 from backend.database.db_postgres import async_db_session
+from backend.common.security.user_cache import current_user_cache
 from backend.database.db_redis import redis_client
 
 
@@ -66,14 +67,17 @@ class RoleService:
                 if role:
                     raise errors.ForbiddenError(msg='already exists')
             count = await role_dao.update_roleinfo(db, pk, obj)
-            return count
+        # Cached users embed their roles
+        await current_user_cache.invalidate()
+        return count
 
     
     @staticmethod
     async def delete(*, pk: list[int]) -> int:
         async with async_db_session.begin() as db:
             count = await role_dao.delete(db, pk)
-            return count
+        await current_user_cache.invalidate()
+        return count
 
 
 role_service = RoleService()
\ No newline at end of file
@@ -16,6 +16,7 @@ from backend.schemas.user import (
 )
 from backend.common.exception import errors
 from backend.common.security.jwt import get_hash_password, password_verify, superuser_verify
+from backend.common.security.user_cache import current_user_cache
 from backend.core.conf import settings
 from backend.database.db_postgres import async_db_session
 from backend.database.db_redis import redis_client
@@ -42,11 +43,11 @@ class ClientService:
             key_prefix = [
                 f'{settings.TOKEN_REDIS_PREFIX}:{request.user.id}',
                 f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{request.user.id}',
-                f'{settings.JWT_USER_REDIS_PREFIX}:{request.user.id}',
             ]
             for key in key_prefix:
                 await redis_client.delete_prefix(key)
-            return count
+        await current_user_cache.invalidate(request.user.x_id)
+        return count
     
     @staticmethod
     async def pwd_reset(*, email: EmailStr, token: str, obj: UserResetPassword) -> int:
@@ -68,11 +69,11 @@ class ClientService:
             key_prefix = [
                 f'{settings.TOKEN_REDIS_PREFIX}:{user.id}',
                 f'{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user.id}',
-                f'{settings.JWT_USER_REDIS_PREFIX}:{user.id}',
             ]
             for key in key_prefix:
                 await redis_client.delete_prefix(key)
-            return count
+        await current_user_cache.invalidate(user.x_id)
+        return count
         
     @staticmethod
     async def get_userinfo(*, email: str) -> User:
@@ -103,7 +104,8 @@ class ClientService:
                 raise errors.NotFoundError(msg='The user does not exist')
 
             count = await user_dao.update_user_info(db, id, obj.model_dump(exclude_none=True, exclude_unset=True, exclude={}))
-            return count
+        await current_user_cache.invalidate(input_user.x_id)
+        return count
     @staticmethod
     async def get_profile(*, id: int) -> User:
         async with async_db_session() as db:
@@ -142,7 +144,8 @@ class ClientService:
             ]
             for key in key_prefix:
                 await redis_client.delete_prefix(key)
-            return count
+        await current_user_cache.invalidate(input_user.x_id)
+        return count
 
     @staticmethod
     async def get_by_x_id(x_id: str) -> User | None:
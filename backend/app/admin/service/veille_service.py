@@ -1,4 +1,7 @@
+import json
 import os
+import re
+import time
 from typing import List, Dict, TypedDict, Optional
 from urllib.parse import urljoin
 import requests
@@ -9,6 +12,7 @@ from sqlalchemy.orm import Session
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_deepseek import ChatDeepSeek
 from langgraph.graph import StateGraph, END
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.schemas.veille import ArticleAnalysisPydantic
 # Imports depuis notre module `veille`, corrigés
@@ -16,11 +20,16 @@ from ....schemas import veille as veille_schema
 from ....crud import veille as crud_veille
 
 from ....core.conf import settings
+from ....database.db_redis import RedisCli
+from ....utils.json_repair import repair_json
+from ....utils.prometheus import LLM_CALLS, LLM_JSON_REPAIRS, LLM_LATENCY, LLM_RETRIES, LLM_TOKENS
 
 # Initialisation du LLM en utilisant la configuration centrale
-from pydantic import SecretStr
+from pydantic import SecretStr, ValidationError
 
-llm = ChatDeepSeek(api_key=SecretStr(settings.DEEPSEEK_API_KEY), model="deepseek-chat", temperature=0)
+LLM_MODEL = "deepseek-chat"
+# Les tentatives sont gérées par `analyze_content` pour être comptées
+llm = ChatDeepSeek(api_key=SecretStr(settings.DEEPSEEK_API_KEY), model=LLM_MODEL, temperature=0, max_retries=0)
 
 
 # --- Fonctions de Scraping et Registre ---
@@ -74,12 +83,248 @@ SCRAPER_REGISTRY = {
 }
 
 # --- Logique LangGraph interne au service ---
+class ExtractedArticle(FoundArticle, total=False):
+    date: str
+    content: Optional[str]
+    error: str
+
 class AgentState(TypedDict):
-    db_session: AsyncSession
     query: str
     sites_to_process: List[str]
     current_site: str
     found_articles: List[FoundArticle]
+    extracted_articles: List[ExtractedArticle]
+
+# Prompts d'analyse versionnés : toute modification du texte se fait dans une nouvelle version.
+# La version est stockée avec chaque analyse ; `reanalyze_outdated_articles` met à jour les anciennes.
+_ANALYSIS_TEMPLATE = """Vous êtes un analyste technologique mondial doublé d'un stratège pour l'Afrique. Pour l'article fourni, effectuez une analyse complète en deux temps : une analyse globale et neutre, puis une analyse stratégique spécifique à l'Afrique.
+
+**Partie 1 : Analyse Globale (Neutre)**
+1.  **Résumé Neutre :** Rédigez un résumé factuel et dense de l'article, de style journalistique (type agence de presse), strictement compris entre 700 et 800 caractères.
+2.  **Problématique Générale :** Identifiez la problématique principale ou universelle soulevée.
+
+**Partie 2 : Analyse Stratégique pour l'Afrique**
+3.  **Impact sur l'Afrique :** Quel est l'impact direct ou indirect pour le continent ?
+4.  **Problématique Spécifique à l'Afrique :** Quelle dépendance ou faiblesse cela révèle-t-il pour l'Afrique ?
+5.  **Éveil de Conscience :** Quelle est la leçon critique pour les acteurs de la tech africaine ?
+6.  **Piste d'Opportunité :** Quelle opportunité concrète cela crée-t-il ?
+7.  **Score de Pertinence :** Attribuez un score de 1 à 10 sur l'importance de cette nouvelle pour l'Afrique.
+    
+Article à analyser : <article_text>{content}</article_text>"""
+
+# v1 : appel d'outil (`with_structured_output`) ; v2 : même consigne, réponse en mode JSON
+# avec la consigne de format ci-dessous. Le format de sortie fait partie de la version :
+# les analyses produites en v1 sont ainsi reconnues par la ré-analyse.
+ANALYSIS_PROMPTS: Dict[str, str] = {
+    "v1": _ANALYSIS_TEMPLATE,
+    "v2": _ANALYSIS_TEMPLATE,
+}
+ANALYSIS_PROMPT_VERSION = "v2"
+
+# Mode JSON : la complétion brute est validée localement (pydantic-core), sans passer par
+# l'appel d'outil et le parseur de LangChain. La consigne de format est ajoutée à chaque version
+# de prompt (une ré-analyse exécute toujours la version courante).
+JSON_OUTPUT_INSTRUCTIONS = "\n\nRépondez uniquement par un objet JSON valide, sans texte autour, avec exactement ces clés :\n" + "\n".join(
+    f"- {name} : {field.description}" for name, field in veille_schema.ArticleAnalysisPydantic.model_fields.items()
+)
+
+json_llm = llm.bind(response_format={"type": "json_object"})
+analysis_chains = {
+    version: ChatPromptTemplate.from_template(template + JSON_OUTPUT_INSTRUCTIONS) | json_llm
+    for version, template in ANALYSIS_PROMPTS.items()
+}
+
+def parse_analysis(text: str) -> tuple[dict, bool]:
+    """
+    Valide la complétion JSON du LLM ; en cas d'échec, répare localement les défauts courants
+    (balises markdown, texte autour, virgules finales, document tronqué) et revalide.
+    Renvoie l'analyse et si une réparation a été nécessaire ; lève `ValidationError` sinon.
+    """
+    try:
+        return veille_schema.ArticleAnalysisPydantic.model_validate_json(text).model_dump(), False
+    except ValidationError:
+        repaired = repair_json(text)
+        return veille_schema.ArticleAnalysisPydantic.model_validate_json(repaired).model_dump(), True
+
+class LLMUsage(TypedDict):
+    model: str
+    prompt_version: str
+    content_length: int
+    prompt_tokens: int
+    completion_tokens: int
+    latency_ms: int
+    retries: int
+    outcome: str
+
+class AnalysisError(Exception):
+    """Échec de l'analyse LLM ; `usage` décrit les appels effectués malgré tout."""
+    def __init__(self, message: str, usage: LLMUsage):
+        super().__init__(message)
+        self.usage = usage
+
+def _record_llm_metrics(usage: LLMUsage) -> None:
+    labels = {"model": usage["model"], "prompt_version": usage["prompt_version"]}
+    LLM_CALLS.labels(**labels, outcome=usage["outcome"]).inc()
+    if usage["retries"]:
+        LLM_RETRIES.labels(**labels).inc(usage["retries"])
+    LLM_TOKENS.labels(**labels, kind="prompt").observe(usage["prompt_tokens"])
+    LLM_TOKENS.labels(**labels, kind="completion").observe(usage["completion_tokens"])
+    LLM_LATENCY.labels(**labels, outcome=usage["outcome"]).observe(usage["latency_ms"] / 1000)
+
+async def analyze_content(content: str, version: str = ANALYSIS_PROMPT_VERSION) -> tuple[dict, LLMUsage]:
+    """
+    Analyse un contenu avec la version de prompt demandée, en mode JSON.
+    Les erreurs d'appel et les réponses irréparables sont retentées (`VEILLE_LLM_MAX_RETRIES`) ;
+    tokens, latence, tentatives et résultat sont exportés vers Prometheus et renvoyés avec l'analyse.
+    Lève `AnalysisError` en cas d'échec.
+    """
+    content = content[:8000]
+    usage = LLMUsage(
+        model=LLM_MODEL, prompt_version=version, content_length=len(content),
+        prompt_tokens=0, completion_tokens=0, latency_ms=0, retries=0, outcome="success",
+    )
+    started = time.perf_counter()
+    last_error = None
+    try:
+        for attempt in range(settings.VEILLE_LLM_MAX_RETRIES + 1):
+            if attempt:
+                usage["retries"] += 1
+            try:
+                message = await analysis_chains[version].ainvoke({"content": content})
+            except Exception as llm_error:
+                usage["outcome"], last_error = "error", f"Erreur du LLM: {llm_error}"
+                if attempt < settings.VEILLE_LLM_MAX_RETRIES:
+                    await asyncio.sleep(2 ** attempt)
+                continue
+
+            token_usage = getattr(message, "usage_metadata", None) or {}
+            usage["prompt_tokens"] += token_usage.get("input_tokens", 0)
+            usage["completion_tokens"] += token_usage.get("output_tokens", 0)
+
+            try:
+                analysis_dict, repaired = parse_analysis(str(message.content))
+            except ValidationError as parse_error:
+                # Échec dur (réparation impossible ou champs invalides) : seul cas où l'on redemande au modèle
+                usage["outcome"], last_error = "parse_error", f"Réponse du LLM invalide: {parse_error}"
+                continue
+
+            if repaired:
+                LLM_JSON_REPAIRS.labels(model=usage["model"], prompt_version=version).inc()
+            usage["outcome"] = "success"
+            return analysis_dict, usage
+
+        raise AnalysisError(last_error, usage)
+    finally:
+        usage["latency_ms"] = int((time.perf_counter() - started) * 1000)
+        _record_llm_metrics(usage)
+
+# --- Analyse groupée de plusieurs articles courts en une requête ---
+BATCH_JSON_OUTPUT_INSTRUCTIONS = (
+    "\n\nLe texte à analyser contient plusieurs articles distincts, chacun dans une balise <article index=\"N\">. "
+    "Analysez chaque article séparément, comme s'il était seul. "
+    "Répondez uniquement par un objet JSON valide, sans texte autour, de la forme "
+    "{{\"analyses\": [...]}} avec un élément par article, contenant exactement ces clés :\n"
+    "- index : l'index de l'article analysé\n"
+) + "\n".join(
+    f"- {name} : {field.description}" for name, field in veille_schema.ArticleAnalysisPydantic.model_fields.items()
+)
+
+batch_analysis_chains = {
+    version: ChatPromptTemplate.from_template(template + BATCH_JSON_OUTPUT_INSTRUCTIONS) | json_llm
+    for version, template in ANALYSIS_PROMPTS.items()
+}
+
+def _parse_batch_analyses(text: str, count: int) -> List[Optional[dict]]:
+    """Analyses d'une réponse groupée, rangées par index ; None pour un élément absent ou invalide."""
+    try:
+        batch = veille_schema.ArticleAnalysisBatchPydantic.model_validate_json(text)
+    except ValidationError:
+        batch = veille_schema.ArticleAnalysisBatchPydantic.model_validate_json(repair_json(text))
+
+    analyses: List[Optional[dict]] = [None] * count
+    for item in batch.analyses:
+        index = item.get("index")
+        if not isinstance(index, int) or not 0 <= index < count or analyses[index] is not None:
+            continue
+        try:
+            analyses[index] = veille_schema.ArticleAnalysisPydantic.model_validate(item).model_dump()
+        except ValidationError:
+            continue
+    return analyses
+
+async def analyze_batch(contents: List[str], version: str = ANALYSIS_PROMPT_VERSION) -> List[Optional[tuple[dict, LLMUsage]]]:
+    """
+    Analyse plusieurs contenus courts en un seul appel : le long prompt n'est envoyé qu'une fois.
+    Pas de nouvelle tentative : les éléments manquants ou invalides (None) sont à analyser un par un.
+    Tokens et latence de l'appel sont répartis entre les articles au prorata de leur taille.
+    """
+    articles_text = "\n".join(f'<article index="{index}">{content}</article>' for index, content in enumerate(contents))
+    total_length = sum(len(content) for content in contents)
+    batch_usage = LLMUsage(
+        model=LLM_MODEL, prompt_version=version, content_length=total_length,
+        prompt_tokens=0, completion_tokens=0, latency_ms=0, retries=0, outcome="error",
+    )
+    analyses: List[Optional[dict]] = [None] * len(contents)
+    started = time.perf_counter()
+    try:
+        message = await batch_analysis_chains[version].ainvoke({"content": articles_text})
+        token_usage = getattr(message, "usage_metadata", None) or {}
+        batch_usage["prompt_tokens"] = token_usage.get("input_tokens", 0)
+        batch_usage["completion_tokens"] = token_usage.get("output_tokens", 0)
+        batch_usage["outcome"] = "parse_error"
+        analyses = _parse_batch_analyses(str(message.content), len(contents))
+        if all(analysis is not None for analysis in analyses):
+            batch_usage["outcome"] = "success"
+    except Exception as batch_error:
+        print(f"ERREUR lors de l'analyse groupée de {len(contents)} articles : {batch_error}")
+    finally:
+        batch_usage["latency_ms"] = int((time.perf_counter() - started) * 1000)
+        _record_llm_metrics(batch_usage)
+
+    results: List[Optional[tuple[dict, LLMUsage]]] = []
+    for content, analysis_dict in zip(contents, analyses):
+        if analysis_dict is None:
+            results.append(None)
+            continue
+        share = len(content) / total_length if total_length else 1 / len(contents)
+        results.append((analysis_dict, LLMUsage(
+            model=LLM_MODEL, prompt_version=version, content_length=len(content),
+            prompt_tokens=round(batch_usage["prompt_tokens"] * share),
+            completion_tokens=round(batch_usage["completion_tokens"] * share),
+            latency_ms=round(batch_usage["latency_ms"] * share), retries=0, outcome="success",
+        )))
+    return results
+
+async def analyze_contents(
+    contents: List[str], version: str = ANALYSIS_PROMPT_VERSION
+) -> List[tuple[Optional[dict], LLMUsage, Optional[str]]]:
+    """
+    Analyse une liste de contenus : `(analyse, consommation, erreur)` pour chacun, dans l'ordre.
+    Les contenus d'au plus `VEILLE_LLM_BATCH_MAX_CHARS` caractères sont groupés par `VEILLE_LLM_BATCH_SIZE` ;
+    les autres, et ceux dont l'analyse groupée a échoué, sont analysés un par un.
+    """
+    results: List[Optional[tuple[Optional[dict], LLMUsage, Optional[str]]]] = [None] * len(contents)
+
+    batch_size = settings.VEILLE_LLM_BATCH_SIZE
+    if batch_size > 1:
+        short = [index for index, content in enumerate(contents) if len(content) <= settings.VEILLE_LLM_BATCH_MAX_CHARS]
+        for start in range(0, len(short), batch_size):
+            chunk = short[start:start + batch_size]
+            if len(chunk) < 2:
+                break
+            for index, result in zip(chunk, await analyze_batch([contents[index] for index in chunk], version)):
+                if result is not None:
+                    results[index] = (*result, None)
+
+    for index, content in enumerate(contents):
+        if results[index] is not None:
+            continue
+        try:
+            analysis_dict, usage = await analyze_content(content, version)
+            results[index] = (analysis_dict, usage, None)
+        except AnalysisError as llm_error:
+            results[index] = (None, llm_error.usage, str(llm_error))
+    return results
 
 # --- Nœuds du Graphe ---
 async def plan_next_site(state: AgentState) -> dict:
@@ -106,78 +351,32 @@ async def scraper_dispatcher(state: AgentState) -> dict:
         print(f"ERREUR lors du scraping de {site_url}: {e}")
         return {}
 
-async def extract_analyze_and_save(state: AgentState) -> dict:
-    print("\n--- NŒUD FINAL : Extraction, Analyse et Sauvegarde ---")
+def extract_article(article: FoundArticle) -> ExtractedArticle:
+    """Télécharge et extrait le contenu d'un article. Indépendant de la requête."""
+    extracted: ExtractedArticle = {**article}
+    try:
+        downloaded = trafilatura.fetch_url(article['url'])
+        if not downloaded:
+            extracted["error"] = "Téléchargement échoué"
+        else:
+            content = trafilatura.extract(downloaded, favor_recall=True)
+            metadata = trafilatura.extract_metadata(downloaded)
+            date = metadata.date if metadata else "N/A"
+            extracted.update({"date": str(date), "content": content})
+    except Exception as e:
+        extracted["error"] = f"Erreur d'extraction: {e}"
+    return extracted
+
+async def extract_articles(state: AgentState) -> dict:
+    print("\n--- NŒUD FINAL : Extraction ---")
     all_found_articles = state.get("found_articles", [])
     if not all_found_articles:
-        return {}
+        return {"extracted_articles": []}
 
     # Déduplication des articles par URL
     unique_articles_list = list({article['url']: article for article in all_found_articles}.values())
-    print(f"Traitement de {len(unique_articles_list)} articles uniques.")
-
-    # Prompt pour le LLM
-    analysis_prompt_template = """Vous êtes un analyste technologique mondial doublé d'un stratège pour l'Afrique. Pour l'article fourni, effectuez une analyse complète en deux temps : une analyse globale et neutre, puis une analyse stratégique spécifique à l'Afrique.
-
-**Partie 1 : Analyse Globale (Neutre)**
-1.  **Résumé Neutre :** Rédigez un résumé factuel et dense de l'article, de style journalistique (type agence de presse), strictement compris entre 700 et 800 caractères.
-2.  **Problématique Générale :** Identifiez la problématique principale ou universelle soulevée.
-
-**Partie 2 : Analyse Stratégique pour l'Afrique**
-3.  **Impact sur l'Afrique :** Quel est l'impact direct ou indirect pour le continent ?
-4.  **Problématique Spécifique à l'Afrique :** Quelle dépendance ou faiblesse cela révèle-t-il pour l'Afrique ?
-5.  **Éveil de Conscience :** Quelle est la leçon critique pour les acteurs de la tech africaine ?
-6.  **Piste d'Opportunité :** Quelle opportunité concrète cela crée-t-il ?
-7.  **Score de Pertinence :** Attribuez un score de 1 à 10 sur l'importance de cette nouvelle pour l'Afrique.
-    
-Article à analyser : <article_text>{content}</article_text>"""
-
-    analysis_prompt = ChatPromptTemplate.from_template(analysis_prompt_template)
-    analysis_chain = analysis_prompt | llm.with_structured_output(veille_schema.ArticleAnalysisPydantic)
-
-    db = state["db_session"]
-
-    for article in unique_articles_list:
-        article_data_for_crud = {**article}
-        try:
-            downloaded = trafilatura.fetch_url(article['url'])
-            if not downloaded:
-                article_data_for_crud["error"] = "Téléchargement échoué"
-            else:
-                content = trafilatura.extract(downloaded, favor_recall=True)
-                metadata = trafilatura.extract_metadata(downloaded)
-                date = metadata.date if metadata else "N/A"
-
-                article_data_for_crud.update({
-                    "date": str(date),
-                    "content": content
-                })
-
-                if content and len(content) > 250:
-                    try:
-                        # Appel LLM
-                        analysis_result_obj = analysis_chain.invoke({"content": content[:8000]})
-
-                        # S'assurer que c'est bien un Pydantic Model avant model_dump
-                        if isinstance(analysis_result_obj, veille_schema.ArticleAnalysisPydantic):
-                            analysis_dict = analysis_result_obj.model_dump()
-                        else:
-                            analysis_dict = dict(analysis_result_obj)
-
-                        article_data_for_crud["analysis"] = analysis_dict
-                        article_data_for_crud["score_pertinence"] = analysis_dict.get("score_pertinence", 0)
-                    except Exception as llm_error:
-                        article_data_for_crud["error"] = f"Erreur du LLM: {llm_error}"
-                else:
-                    article_data_for_crud["error"] = "Contenu insuffisant"
-        except Exception as e:
-            article_data_for_crud["error"] = f"Erreur d'extraction: {e}"
-
-        # Sauvegarde en base
-        await crud_veille.create_or_update_article(db=db, article_data=article_data_for_crud)
-
-    print(f"Traitement et sauvegarde terminés pour {len(unique_articles_list)} articles.")
-    return {"status": "SUCCESS", "processed_articles": len(unique_articles_list)}
+    print(f"Extraction de {len(unique_articles_list)} articles uniques.")
+    return {"extracted_articles": [extract_article(article) for article in unique_articles_list]}
 
 
 # --- Logique de Routage et Construction ---
@@ -188,28 +387,225 @@ def create_langgraph_app():
     workflow = StateGraph(AgentState)
     workflow.add_node("planner", plan_next_site)
     workflow.add_node("dispatcher", scraper_dispatcher)
-    workflow.add_node("analyze_and_save", extract_analyze_and_save)
+    workflow.add_node("extract", extract_articles)
     workflow.set_entry_point("planner")
-    workflow.add_conditional_edges("planner", should_continue, {"continue_scraping": "dispatcher", "end_scraping": "analyze_and_save"})
+    workflow.add_conditional_edges("planner", should_continue, {"continue_scraping": "dispatcher", "end_scraping": "extract"})
     workflow.add_edge("dispatcher", "planner")
-    workflow.add_edge("analyze_and_save", END)
+    workflow.add_edge("extract", END)
     return workflow.compile()
 
 langgraph_app =  create_langgraph_app()
 
-# --- Fonction principale du Service ---
-async def run_veille_workflow(db: AsyncSession, query: str):
+
+# --- Crawl et extraction (partagés entre requêtes) ---
+async def crawl_and_extract(query: str) -> List[ExtractedArticle]:
     initial_state = AgentState(
-        db_session=db,
         query=query,
         sites_to_process=list(SCRAPER_REGISTRY.keys()),
         current_site="",
         found_articles=[],
+        extracted_articles=[],
     )
-    
-    print(f"Lancement du workflow de veille pour la requête : '{query}'")
     result = await langgraph_app.ainvoke(initial_state, recursion_limit=15)
+    return result.get("extracted_articles", [])
+
+def _crawl_window_key() -> str:
+    window = int(time.time() // settings.VEILLE_CRAWL_WINDOW_SECONDS)
+    return f'{settings.VEILLE_CRAWL_REDIS_PREFIX}:{window}'
+
+async def get_shared_crawl(redis: Redis, query: str) -> tuple[str, List[ExtractedArticle]]:
+    """
+    Retourne le crawl + extraction de la fenêtre courante.
+    Le premier worker de la fenêtre prend le verrou et crawle, les autres attendent son résultat.
+    """
+    window_key = _crawl_window_key()
+    lock_key = f'{window_key}:lock'
+
+    cached = await redis.get(window_key)
+    if cached:
+        print(f"Réutilisation du crawl partagé {window_key} pour '{query}'.")
+        return window_key, json.loads(cached)
+
+    if await redis.set(lock_key, query, nx=True, ex=settings.VEILLE_CRAWL_LOCK_SECONDS):
+        try:
+            articles = await crawl_and_extract(query)
+            await redis.set(window_key, json.dumps(articles), ex=settings.VEILLE_CRAWL_WINDOW_SECONDS)
+        finally:
+            await redis.delete(lock_key)
+        return window_key, articles
+
+    # Un autre worker crawle déjà cette fenêtre : on attend son résultat
+    print(f"Crawl {window_key} en cours par un autre worker, attente pour '{query}'.")
+    deadline = time.monotonic() + settings.VEILLE_CRAWL_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(5)
+        cached = await redis.get(window_key)
+        if cached:
+            return window_key, json.loads(cached)
+        if not await redis.exists(lock_key):
+            # Le crawler a échoué sans publier de résultat
+            break
+    return window_key, await crawl_and_extract(query)
+
+
+# --- Filtrage et analyse (par requête) ---
+def is_relevant(article: ExtractedArticle, query: str) -> bool:
+    """Filtre de pertinence lexical : au moins un terme de la requête dans le titre ou le contenu."""
+    terms = [term for term in re.findall(r'\w+', query.lower()) if len(term) >= 3]
+    if not terms:
+        return True
+    haystack = f"{article.get('title', '')} {article.get('content') or ''}".lower()
+    return any(term in haystack for term in terms)
+
+async def analyze_and_save(
+    db: AsyncSession,
+    query: str,
+    extracted_articles: List[ExtractedArticle],
+    redis: Optional[Redis] = None,
+    window_key: Optional[str] = None,
+) -> dict:
+    print(f"\n--- Analyse et Sauvegarde pour '{query}' ---")
+    if window_key:
+        # Le crawl partagé couvre plusieurs requêtes : seuls les articles de celle-ci sont retenus.
+        # Le crawl par requête est déjà ciblé, tous ses articles sont enregistrés comme auparavant.
+        relevant_articles = [article for article in extracted_articles if is_relevant(article, query)]
+        print(f"{len(relevant_articles)}/{len(extracted_articles)} articles pertinents pour '{query}'.")
+    else:
+        relevant_articles = extracted_articles
+
+    # En mode partagé, un article n'est analysé qu'une fois par fenêtre, quelle que soit la requête
+    analyzed_key = f'{window_key}:analyzed' if redis and window_key else None
+
+    articles_to_save: List[dict] = []
+    articles_to_analyze: List[tuple[dict, str]] = []
+    for article in relevant_articles:
+        article_data_for_crud = {**article, "published_at": crud_veille.normalize_published_at(article.get("date"))}
+        content = article.get("content")
+
+        if not article.get("error"):
+            if content and len(content) > 250:
+                if analyzed_key:
+                    if not await redis.sadd(analyzed_key, article['url']):
+                        continue
+                    await redis.expire(analyzed_key, settings.VEILLE_CRAWL_WINDOW_SECONDS)
+                articles_to_analyze.append((article_data_for_crud, content))
+                continue
+            article_data_for_crud["error"] = "Contenu insuffisant"
+        articles_to_save.append(article_data_for_crud)
+
+    # Sauvegarde en base des articles sans analyse
+    processed = 0
+    for article_data_for_crud in articles_to_save:
+        await crud_veille.create_or_update_article(db=db, article_data=article_data_for_crud, redis=redis)
+        processed += 1
+
+    # Appels LLM (groupés pour les articles courts si `VEILLE_LLM_BATCH_SIZE` > 1). Chaque lot est
+    # enregistré dès son retour : un arrêt du worker en cours de route ne perd pas les analyses déjà payées.
+    chunk_size = max(settings.VEILLE_LLM_BATCH_SIZE, 1)
+    for start in range(0, len(articles_to_analyze), chunk_size):
+        chunk = articles_to_analyze[start:start + chunk_size]
+        results = await analyze_contents([content for _, content in chunk])
+        for (article_data_for_crud, _), (analysis_dict, usage, llm_error) in zip(chunk, results):
+            if analysis_dict is not None:
+                article_data_for_crud["analysis"] = analysis_dict
+                article_data_for_crud["analysis_version"] = ANALYSIS_PROMPT_VERSION
+                article_data_for_crud["score_pertinence"] = analysis_dict.get("score_pertinence", 0)
+            else:
+                article_data_for_crud["error"] = llm_error
+                if analyzed_key:
+                    # Une autre requête de la fenêtre pourra retenter l'analyse
+                    await redis.srem(analyzed_key, article_data_for_crud['url'])
+            article_data_for_crud["llm_usage"] = usage
+            crud_veille.add_llm_call_log(
+                db, article_url=article_data_for_crud['url'], source=article_data_for_crud.get('source'), usage=usage
+            )
+            await crud_veille.create_or_update_article(db=db, article_data=article_data_for_crud, redis=redis)
+            processed += 1
+
+    print(f"Traitement et sauvegarde terminés pour {processed} articles.")
+    return {"status": "SUCCESS", "processed_articles": processed}
+
+
+# --- Fonction principale du Service ---
+async def run_veille_workflow(db: AsyncSession, query: str, shared: Optional[bool] = None):
+    shared = settings.VEILLE_SHARED_CRAWL if shared is None else shared
+    print(f"Lancement du workflow de veille pour la requête : '{query}' (crawl partagé: {shared})")
+
+    # Client dédié : la boucle asyncio est recréée à chaque tâche Celery
+    redis = RedisCli()
+    try:
+        if not shared:
+            extracted_articles = await crawl_and_extract(query)
+            result = await analyze_and_save(db, query, extracted_articles, redis=redis)
+        else:
+            window_key, extracted_articles = await get_shared_crawl(redis, query)
+            result = await analyze_and_save(db, query, extracted_articles, redis=redis, window_key=window_key)
+    finally:
+        await redis.close()
+
     print("Workflow de veille terminé.")
     return result
 
-    
\ No newline at end of file
+
+# --- Ré-analyse des articles dont le prompt est périmé ---
+def _reanalysis_checkpoint_key(version: str) -> str:
+    return f'{settings.VEILLE_REANALYSIS_REDIS_PREFIX}:{version}:checkpoint'
+
+async def reanalyze_outdated_articles(db: AsyncSession, reset: bool = False, max_articles: Optional[int] = None) -> dict:
+    """
+    Ré-analyse, avec la version courante du prompt, les articles analysés par une version antérieure.
+
+    Les articles sont lus par pages (pagination par ID) et les appels au LLM espacés
+    selon `VEILLE_LLM_MAX_CALLS_PER_MINUTE`. Après chaque page validée, l'ID du dernier article
+    est enregistré dans Redis : une tâche interrompue reprend à ce point (`reset` repart du début).
+    """
+    version = ANALYSIS_PROMPT_VERSION
+    checkpoint_key = _reanalysis_checkpoint_key(version)
+    min_interval = 60 / settings.VEILLE_LLM_MAX_CALLS_PER_MINUTE
+    processed = failed = 0
+
+    # Client dédié : la boucle asyncio est recréée à chaque tâche Celery
+    redis = RedisCli()
+    try:
+        if reset:
+            await redis.delete(checkpoint_key)
+        after_id = int(await redis.get(checkpoint_key) or 0)
+        print(f"Ré-analyse vers le prompt {version} à partir de l'article {after_id}.")
+
+        last_call = 0.0
+        while max_articles is None or processed + failed < max_articles:
+            page_size = settings.VEILLE_REANALYSIS_PAGE_SIZE
+            if max_articles is not None:
+                page_size = min(page_size, max_articles - processed - failed)
+            page = await crud_veille.get_articles_to_reanalyze(db, version=version, after_id=after_id, limit=page_size)
+            if not page:
+                break
+
+            for article_id, url, source, content in page:
+                wait = last_call + min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                last_call = time.monotonic()
+                try:
+                    analysis_dict, usage = await analyze_content(content, version)
+                except AnalysisError as llm_error:
+                    # L'ancienne analyse est conservée ; un prochain passage avec `reset` la retentera
+                    print(f"ERREUR LLM lors de la ré-analyse de l'article {article_id}: {llm_error}")
+                    crud_veille.add_llm_call_log(db, article_url=url, source=source, usage=llm_error.usage)
+                    failed += 1
+                    continue
+                crud_veille.add_llm_call_log(db, article_url=url, source=source, usage=usage)
+                await crud_veille.update_article_analysis(
+                    db, article_id=article_id, analysis=analysis_dict, version=version, llm_usage=usage
+                )
+                processed += 1
+
+            after_id = page[-1][0]
+            await db.commit()
+            await redis.set(checkpoint_key, after_id)
+            await crud_veille.article_cache.bump(redis)
+            print(f"Ré-analyse : {processed} articles mis à jour, {failed} échecs (point de reprise : {after_id}).")
+    finally:
+        await redis.close()
+
+    return {"status": "SUCCESS", "version": version, "processed_articles": processed, "failed_articles": failed}
@@ -0,0 +1,31 @@
+# backend/app/tasks/logs.py
+from backend.common.log import log
+from backend.core.celery_app import celery_app
+from backend.crud.crud_login_log import login_log_generation
+from backend.crud.crud_opera_log import opera_log_generation
+from backend.database.db_postgres import async_engine, run_async
+from backend.database.db_redis import RedisCli
+from backend.database.partition import maintain_log_partitions
+from backend.utils.timezone import timezone
+
+_GENERATIONS = {'opera_log': opera_log_generation, 'login_log': login_log_generation}
+
+
+async def _maintain_partitions() -> dict[str, list[str]]:
+    async with async_engine.begin() as conn:
+        removed = await maintain_log_partitions(conn, timezone.now().date())
+    redis = RedisCli()
+    try:
+        for table, partitions in removed.items():
+            if partitions:
+                log.info(f'Log retention: {table} partitions removed {partitions}')
+                await _GENERATIONS[table].bump(redis)
+    finally:
+        await redis.close()
+    return removed
+
+
+@celery_app.task(name='logs.maintain_partitions')
+def maintain_log_partitions_task():
+    """Create the upcoming monthly partitions of the log tables and drop the expired ones, scheduled by celery beat"""
+    return run_async(_maintain_partitions())
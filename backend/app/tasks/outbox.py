@@ -0,0 +1,135 @@
+# backend/app/tasks/outbox.py
+import asyncio
+
+from backend.common.log import log
+from backend.core.celery_app import celery_app
+from backend.core.conf import settings
+from backend.crud.crud_outbox import outbox_dao
+from backend.database.db_postgres import async_db_session, run_async
+from backend.database.db_redis import RedisCli
+
+
+async def _relay_batch() -> tuple[int, int]:
+    """
+    Send one batch of pending outbox messages to the broker
+
+    Messages are marked dispatched only after they were handed to the broker, in the transaction that
+    locked them: delivery is at-least-once, consumers deduplicate on the task id (`claim_delivery`).
+
+    :return: Number of messages claimed and dispatched
+    """
+    async with async_db_session.begin() as db:
+        messages = await outbox_dao.claim_pending(db, settings.OUTBOX_RELAY_BATCH_SIZE, settings.OUTBOX_MAX_ATTEMPTS)
+        dispatched = []
+        for message in messages:
+            try:
+                celery_app.send_task(
+                    message.task_name,
+                    args=message.payload.get('args', []),
+                    kwargs=message.payload.get('kwargs', {}),
+                    task_id=message.dedup_key,
+                )
+            except Exception as e:
+                log.error(f'Outbox relay failure (message {message.id}, {message.task_name}): {e}')
+                await outbox_dao.mark_failed(db, message.id, str(e))
+                continue
+            dispatched.append(message.id)
+        await outbox_dao.mark_dispatched(db, dispatched)
+    return len(messages), len(dispatched)
+
+
+async def _relay() -> int:
+    total = 0
+    for _ in range(settings.OUTBOX_RELAY_MAX_BATCHES):
+        claimed, dispatched = await _relay_batch()
+        total += dispatched
+        # A short batch means the outbox is drained
+        if claimed < settings.OUTBOX_RELAY_BATCH_SIZE:
+            break
+    return total
+
+
+@celery_app.task(name='outbox.relay')
+def relay_outbox_task():
+    """Drain the outbox to the broker, scheduled by celery beat"""
+    return {'dispatched': run_async(_relay())}
+
+
+async def _claim_delivery(dedup_key: str) -> bool:
+    redis = RedisCli()
+    try:
+        # Short lease: a consumer crashing before `complete_delivery` does not block the redelivery
+        return bool(
+            await redis.set(
+                f'{settings.OUTBOX_DEDUP_REDIS_PREFIX}:{dedup_key}', 'claimed', nx=True, ex=settings.OUTBOX_DEDUP_CLAIM_SECONDS
+            )
+        )
+    finally:
+        await redis.close()
+
+
+async def _complete_delivery(dedup_key: str) -> None:
+    redis = RedisCli()
+    try:
+        await redis.set(f'{settings.OUTBOX_DEDUP_REDIS_PREFIX}:{dedup_key}', 'done', ex=settings.OUTBOX_DEDUP_EXPIRE_SECONDS)
+    finally:
+        await redis.close()
+
+
+async def _release_delivery(dedup_key: str) -> None:
+    redis = RedisCli()
+    try:
+        await redis.delete(f'{settings.OUTBOX_DEDUP_REDIS_PREFIX}:{dedup_key}')
+    finally:
+        await redis.close()
+
+
+def claim_delivery(dedup_key: str | None) -> bool:
+    """
+    Claim a delivery of an outbox task, to be called at the start of the consumer task
+
+    The claim is a lease: it becomes final with `complete_delivery` once the work succeeded, and is
+    dropped with `release_delivery` on failure, so that a retry or a redelivery can run the task again.
+
+    :param dedup_key: Celery task id (the outbox message dedup key)
+    :return: False if this delivery was already processed, or is being processed
+    """
+    if not dedup_key:
+        return True
+    try:
+        return asyncio.run(_claim_delivery(dedup_key))
+    except Exception as e:
+        # Prefer a duplicate over a lost delivery
+        log.error(f'Outbox dedup check failure ({dedup_key}): {e}')
+        return True
+
+
+def complete_delivery(dedup_key: str | None) -> None:
+    """
+    Mark a claimed delivery as processed, later deliveries of the same message are skipped
+
+    :param dedup_key: Celery task id (the outbox message dedup key)
+    :return:
+    """
+    if not dedup_key:
+        return
+    try:
+        asyncio.run(_complete_delivery(dedup_key))
+    except Exception as e:
+        # The lease expires: a redelivery would then run the task again
+        log.error(f'Outbox dedup completion failure ({dedup_key}): {e}')
+
+
+def release_delivery(dedup_key: str | None) -> None:
+    """
+    Drop the claim of a delivery whose processing failed
+
+    :param dedup_key: Celery task id (the outbox message dedup key)
+    :return:
+    """
+    if not dedup_key:
+        return
+    try:
+        asyncio.run(_release_delivery(dedup_key))
+    except Exception as e:
+        log.error(f'Outbox dedup release failure ({dedup_key}): {e}')
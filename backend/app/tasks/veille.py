@@ -1,30 +1,89 @@
 # backend/app/tasks/veille.py
-import asyncio
+from datetime import date, timedelta
+from typing import List, Optional
 
 # L'IMPORT FONCTIONNE MAINTENANT !
 from backend.core.celery_app import celery_app
 from celery import Task
-from backend.database.db_postgres import async_db_session
+from backend.database.db_postgres import async_db_session, run_async
 from backend.app.admin.service import veille_service
+from backend.crud import veille as crud_veille
+from backend.utils.timezone import timezone
+from backend.app.tasks.outbox import claim_delivery, complete_delivery
 
 
 @celery_app.task(name="veille.run_workflow")
-async def _run_veille_workflow_with_session(query: str):
+async def _run_veille_workflow_with_session(query: str, shared: Optional[bool] = None):
     """Fonction asynchrone pour gérer le cycle de vie de la session."""
     async with async_db_session() as session:
-        await veille_service.run_veille_workflow(db=session, query=query)
+        await veille_service.run_veille_workflow(db=session, query=query, shared=shared)
 
 @celery_app.task(name="veille.trigger_workflow")
-def trigger_veille_task(query: str):
-  
+def trigger_veille_task(query: str, shared: Optional[bool] = None):
+    """
+    `shared` : rattache la requête au crawl partagé de la fenêtre courante
+    (None = valeur de `VEILLE_SHARED_CRAWL`).
+    """
     try:
         print(f"--- Tâche Celery Démarrée : Veille pour '{query}' ---")
         # Exécute la fonction wrapper asynchrone qui gère la session
-        asyncio.run(_run_veille_workflow_with_session(query=query))
+        run_async(_run_veille_workflow_with_session(query=query, shared=shared))
         print(f"--- Tâche de veille pour '{query}' terminée. ---")
         return {"status": "SUCCESS", "message": "Veille terminée."}
     except Exception as e:
         error_message = f"La tâche de veille a échoué : {str(e)}"
         print(f"--- ERREUR Tâche Celery : {error_message} ---")
         return {"status": "FAILURE", "error": error_message}
-    
\ No newline at end of file
+    
+
+
+async def _reanalyze_with_session(reset: bool = False, max_articles: Optional[int] = None):
+    async with async_db_session() as session:
+        return await veille_service.reanalyze_outdated_articles(db=session, reset=reset, max_articles=max_articles)
+
+@celery_app.task(name="veille.reanalyze")
+def reanalyze_articles_task(reset: bool = False, max_articles: Optional[int] = None):
+    """
+    Ré-analyse les articles dont la version de prompt est périmée.
+    Reprend au dernier point de sauvegarde, sauf si `reset` est demandé.
+    """
+    try:
+        print("--- Tâche Celery Démarrée : Ré-analyse des articles ---")
+        return run_async(_reanalyze_with_session(reset=reset, max_articles=max_articles))
+    except Exception as e:
+        error_message = f"La tâche de ré-analyse a échoué : {str(e)}"
+        print(f"--- ERREUR Tâche Celery : {error_message} ---")
+        return {"status": "FAILURE", "error": error_message}
+
+
+async def _rollup_llm_usage_with_session(day: date) -> int:
+    async with async_db_session() as session:
+        return await crud_veille.rollup_llm_usage(session, day)
+
+@celery_app.task(name="veille.rollup_llm_usage")
+def rollup_llm_usage_task(day: Optional[str] = None):
+    """
+    Agrège le journal des appels LLM d'une journée (ISO, par défaut la veille) dans `llm_usage_daily`.
+    """
+    rollup_day = date.fromisoformat(day) if day else timezone.now().date() - timedelta(days=1)
+    rows = run_async(_rollup_llm_usage_with_session(rollup_day))
+    print(f"--- Agrégats LLM du {rollup_day} : {rows} lignes. ---")
+    return {"status": "SUCCESS", "day": rollup_day.isoformat(), "rows": rows}
+
+
+@celery_app.task(name="veille.distribute_articles", bind=True, acks_late=True, reject_on_worker_lost=True)
+def distribute_articles_task(self, article_ids: List[int]):
+    """
+    Diffusion des articles fraîchement publiés (réseaux sociaux, newsletter...).
+    Reçoit un lot d'articles : une publication groupée n'envoie qu'un seul message au broker.
+    Envoyée par le relais de l'outbox (livraison au moins une fois) : les re-livraisons sont ignorées
+    une fois la diffusion terminée ; un arrêt du worker en cours de diffusion la laisse rejouer.
+    Pas encore de canal de diffusion : la tâche ne fait que journaliser le lot. Le canal réel devra libérer
+    la livraison (`release_delivery`) avant de relancer la tâche en cas d'échec.
+    """
+    if not claim_delivery(self.request.id):
+        print(f"--- Diffusion {self.request.id} déjà traitée ou en cours, ignorée. ---")
+        return {"status": "DUPLICATE", "article_ids": article_ids}
+    print(f"--- Tâche Celery : diffusion de {len(article_ids)} article(s) publiés : {article_ids} ---")
+    complete_delivery(self.request.id)
+    return {"status": "SUCCESS", "article_ids": article_ids}
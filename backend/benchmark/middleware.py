@@ -0,0 +1,76 @@
+"""
+Per-request overhead of the middleware stack on a trivial endpoint
+
+Compares the same number of layers implemented with `BaseHTTPMiddleware` (the previous stack) and as
+pure ASGI middleware (the current stack). State and opera-log middleware need Redis and Postgres, so
+they are stood in for by pass-through layers of the same kind.
+
+Usage: python3 -m benchmark.middleware [--requests 5000] [--layers 5]
+"""
+
+import asyncio
+import time
+
+import fire
+import httpx
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from backend.middleware.i18n_middleware import I18nMiddleware
+from backend.utils.prometheus import PrometheusMiddleware
+
+
+class PassThroughHTTPMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+class PassThroughASGIMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.app(scope, receive, send)
+
+
+def create_app(stack: str, layers: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get('/ping')
+    async def ping() -> dict:
+        return {'ping': 'pong'}
+
+    if stack == 'base_http':
+        for _ in range(layers):
+            app.add_middleware(PassThroughHTTPMiddleware)
+    elif stack == 'pure_asgi':
+        app.add_middleware(PrometheusMiddleware, app_name='benchmark')
+        app.add_middleware(I18nMiddleware)
+        for _ in range(max(layers - 2, 0)):
+            app.add_middleware(PassThroughASGIMiddleware)
+    return app
+
+
+async def measure(app: FastAPI, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://benchmark') as client:
+        for _ in range(min(requests // 10, 500)):
+            await client.get('/ping')
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get('/ping')
+        return (time.perf_counter() - start) / requests * 1_000_000
+
+
+def main(requests: int = 5000, layers: int = 5) -> None:
+    results = {stack: asyncio.run(measure(create_app(stack, layers), requests)) for stack in ('none', 'base_http', 'pure_asgi')}
+    baseline = results['none']
+    print(f'{requests} requests, {layers} middleware layers')
+    for stack, per_request in results.items():
+        print(f'{stack: <10} {per_request: >8.1f} µs/request  overhead {per_request - baseline: >7.1f} µs')
+
+
+if __name__ == '__main__':
+    fire.Fire(main)
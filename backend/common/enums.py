@@ -60,6 +60,13 @@ class OperaLogCipherType(IntEnum):
     itsdangerous = 2
     plan = 3
 
+class ExportFormatType(StrEnum):
+    """Bulk export format"""
+
+    ndjson = 'ndjson'
+    csv = 'csv'
+
+
 class RoleDataScopeType(IntEnum):
     """Data range"""
 
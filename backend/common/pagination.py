@@ -1,14 +1,16 @@
 from __future__ import annotations
 
+import base64
 import math
 
-from typing import TYPE_CHECKING, Dict, Generic, Sequence, TypeVar
+from typing import TYPE_CHECKING, Any, Dict, Generic, Sequence, TypeVar
 
 from fastapi import Depends, Query
 from fastapi_pagination import pagination_ctx
 from fastapi_pagination.bases import AbstractPage, AbstractParams, RawParams
 from fastapi_pagination.ext.sqlalchemy import paginate
 from fastapi_pagination.links.bases import create_links
+from msgspec import json
 from pydantic import BaseModel
 
 if TYPE_CHECKING:
@@ -81,3 +83,27 @@ async def paging_data(db: AsyncSession, select: Select, page_data_schema: Schema
 
 # Paging dependency injection
 DependsPagination = Depends(pagination_ctx(_Page))
+
+
+def encode_keyset_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of the last row of a page into an opaque cursor
+
+    :param values: Sort key values, in ORDER BY order
+    :return:
+    """
+    return base64.urlsafe_b64encode(json.encode(values)).decode()
+
+
+def decode_keyset_cursor(cursor: str) -> tuple:
+    """
+    Decode a cursor produced by `encode_keyset_cursor`
+
+    :param cursor:
+    :return:
+    :raises ValueError: If the cursor is malformed
+    """
+    try:
+        return tuple(json.decode(base64.urlsafe_b64decode(cursor.encode())))
+    except Exception as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
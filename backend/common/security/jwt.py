@@ -164,6 +164,25 @@ async def jwt_authentication(token: str) -> str:
     return user_id
 
 
+async def jwt_verify_with_user(user_id: str, token: str, fetch_user: bool = True) -> str | None:
+    """
+    Check a decoded token is still active, fetching the cached user in the same Redis round trip (MGET)
+
+    :param user_id: JWT subject, from `jwt_decode`
+    :param token:
+    :param fetch_user: Whether to read the Redis user cache
+    :return: Cached user JSON, None on a miss or when not fetched
+    """
+    token_key = f'{settings.TOKEN_REDIS_PREFIX}:{user_id}:{token}'
+    if fetch_user:
+        token_verify, cache_user = await redis_client.mget(token_key, f'{settings.JWT_USER_REDIS_PREFIX}:{user_id}')
+    else:
+        token_verify, cache_user = await redis_client.get(token_key), None
+    if not token_verify:
+        raise TokenError(msg='Token has expired')
+    return cache_user
+
+
 async def get_current_user(db: AsyncSession, sub: str) -> User:
     """
     Get the current user through token
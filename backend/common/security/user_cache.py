@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from backend.common.log import log
+from backend.core.conf import settings
+from backend.database.db_redis import redis_client
+from backend.schemas.user import CurrentUserIns
+from backend.utils.singleflight import SingleFlight
+
+# Invalidation message clearing every entry (role changes affect any number of users)
+INVALIDATE_ALL = '*'
+
+
+class CurrentUserCache:
+    """
+    In-process TTL/LRU cache of validated `CurrentUserIns`, in front of the Redis user cache
+
+    A hit costs neither a Redis call nor JSON parsing or validation. Entries are dropped across all
+    workers through a Redis pub/sub channel, the TTL bounds staleness if a message is ever missed.
+    """
+
+    def __init__(self, maxsize: int, ttl: int, channel: str):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.channel = channel
+        self._entries: OrderedDict[str, tuple[float, CurrentUserIns]] = OrderedDict()
+        self._listener: asyncio.Task | None = None
+        self._singleflight: SingleFlight[CurrentUserIns] = SingleFlight()
+
+    def get(self, sub: str) -> CurrentUserIns | None:
+        """
+        Cached user, None if missing or expired
+
+        :param sub: JWT subject (user x_id)
+        :return:
+        """
+        entry = self._entries.get(sub)
+        if entry is None:
+            return None
+        expire_at, user = entry
+        if expire_at < time.monotonic():
+            del self._entries[sub]
+            return None
+        self._entries.move_to_end(sub)
+        return user
+
+    def set(self, sub: str, user: CurrentUserIns) -> None:
+        """
+        Cache a validated user, evicting the least recently used entry when full
+
+        :param sub: JWT subject (user x_id)
+        :param user:
+        :return:
+        """
+        self._entries[sub] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(sub)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def load(self, sub: str, loader: Callable[[], Awaitable[CurrentUserIns]]) -> CurrentUserIns:
+        """
+        Load a user missing from both caches, concurrent misses for the same user share a single loader call
+
+        :param sub: JWT subject (user x_id)
+        :param loader: Coroutine function loading and caching the user
+        :return:
+        """
+        return await self._singleflight.do(sub, loader)
+
+    def discard(self, sub: str) -> None:
+        if sub == INVALIDATE_ALL:
+            self._entries.clear()
+        else:
+            self._entries.pop(sub, None)
+
+    async def invalidate(self, sub: str = INVALIDATE_ALL) -> None:
+        """
+        Drop a user (or every user) from the Redis cache and from the in-process cache of all workers
+
+        :param sub: JWT subject (user x_id), all users by default
+        :return:
+        """
+        self.discard(sub)
+        try:
+            if sub == INVALIDATE_ALL:
+                await redis_client.delete_prefix(settings.JWT_USER_REDIS_PREFIX)
+            else:
+                await redis_client.delete(f'{settings.JWT_USER_REDIS_PREFIX}:{sub}')
+            await redis_client.publish(self.channel, sub)
+        except Exception as e:
+            log.error(f'User cache invalidation failure ({sub}): {e}')
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message['type'] == 'message':
+                        self.discard(message['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f'User cache invalidation channel failure: {e}')
+                # Messages may have been missed while disconnected
+                self._entries.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def start(self) -> None:
+        """
+        Start listening to invalidation messages
+
+        :return:
+        """
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """
+        Stop listening to invalidation messages
+
+        :return:
+        """
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        self._entries.clear()
+
+
+current_user_cache = CurrentUserCache(
+    settings.JWT_USER_LOCAL_CACHE_SIZE,
+    settings.JWT_USER_LOCAL_CACHE_EXPIRE_SECONDS,
+    settings.JWT_USER_INVALIDATION_CHANNEL,
+)
@@ -1,6 +1,9 @@
 # backend/app/core/celery_app.py
 
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_init
+from prometheus_client import start_http_server
 from backend.core.conf import settings
 import os
 # Construire les URLs du broker et du backend
@@ -27,12 +30,40 @@ celery_app = Celery(
     broker=broker_url,
     backend=backend_url,
     # Dire à Celery où trouver les tâches
-    include=["backend.app.tasks.veille"]
+    include=["backend.app.tasks.veille", "backend.app.tasks.outbox", "backend.app.tasks.logs"]
 )
 
 celery_app.conf.update(
     task_track_started=True,
+    # Le relais de l'outbox tourne en continu (celery beat)
+    beat_schedule={
+        "outbox-relay": {
+            "task": "outbox.relay",
+            "schedule": settings.OUTBOX_RELAY_INTERVAL_SECONDS,
+        },
+        # Agrégats LLM de la veille, calculés juste après minuit
+        "veille-llm-usage-rollup": {
+            "task": "veille.rollup_llm_usage",
+            "schedule": crontab(hour=0, minute=15),
+        },
+        # Partitions mensuelles des journaux : création anticipée et rétention
+        "logs-maintain-partitions": {
+            "task": "logs.maintain_partitions",
+            "schedule": crontab(hour=0, minute=30),
+        },
+    },
 )
 
+
+@worker_init.connect
+def start_metrics_server(**kwargs):
+    """
+    Expose les métriques Prometheus du worker (appels, tokens et latence LLM) : l'API ne sert
+    que les siennes. Les tâches doivent s'exécuter dans ce processus (`--pool=solo` ou `threads`).
+    """
+    if settings.CELERY_METRICS_PORT:
+        start_http_server(settings.CELERY_METRICS_PORT)
+
+
 if __name__ == "__main__":
     celery_app.start()
\ No newline at end of file
@@ -22,6 +22,7 @@ class Settings(BaseSettings):
 
     CELERY_BROKER_REDIS_DATABASE: int = 1
     CELERY_BACKEND_REDIS_DATABASE: int = 2
+    CELERY_METRICS_PORT: int = 9808  # Prometheus endpoint of the worker (LLM metrics), 0 disables it
     # Env POSTGRES
     POSTGRES_HOST: str = "localhost"
     POSTGRES_PORT: int = 5432
@@ -116,6 +117,9 @@ class Settings(BaseSettings):
     JWT_COMPANY_REDIS_PREFIX: str = 'boilerplate:company'
     JWT_ADMIN_REDIS_PREFIX: str = 'boilerplate:admin'
     JWT_USER_REDIS_EXPIRE_SECONDS: int = 60 * 60 * 24 * 7
+    JWT_USER_LOCAL_CACHE_SIZE: int = 10000  # validated users kept in process memory
+    JWT_USER_LOCAL_CACHE_EXPIRE_SECONDS: int = 60  # upper bound on staleness if an invalidation is missed
+    JWT_USER_INVALIDATION_CHANNEL: str = 'boilerplate:user:invalidate'
 
     # Permission (RBAC)
     PERMISSION_MODE: Literal['casbin', 'role-menu'] = 'casbin'
@@ -161,6 +165,11 @@ class Settings(BaseSettings):
     LOG_STDOUT_FILENAME: str = 'boilerplate_access.log'
     LOG_STDERR_FILENAME: str = 'boilerplate_error.log'
 
+    # Log tables (opera_log, login_log range-partitioned by month)
+    LOG_PARTITION_PREMAKE_MONTHS: int = 2  # partitions created ahead of the current month
+    LOG_RETENTION_MONTHS: int = 12  # older partitions are removed, 0 keeps everything
+    LOG_RETENTION_DETACH: bool = False  # detach expired partitions (kept as tables for archiving) instead of dropping
+
     # Middleware
     MIDDLEWARE_CORS: bool = True
     MIDDLEWARE_ACCESS: bool = True
@@ -200,6 +209,30 @@ class Settings(BaseSettings):
     IP_LOCATION_PARSE: Literal['online', 'offline', 'false'] = 'online'
     IP_LOCATION_REDIS_PREFIX: str = 'boilerplate:ip:location'
     IP_LOCATION_EXPIRE_SECONDS: int = 60 * 60 * 24 * 1  # expiration time in seconds
+    IP_LOCATION_OFFLINE_CACHE_SIZE: int = 10000  # in-process LRU of offline lookups
+    IP_LOCATION_NEGATIVE_EXPIRE_SECONDS: int = 60 * 5  # failed lookups are retried after this delay
+    IP_LOCATION_ONLINE_URL: str = 'http://ip-api.com'
+    IP_LOCATION_ONLINE_TIMEOUT: float = 3
+    IP_LOCATION_ONLINE_BATCH: bool = False  # resolve queued ips through the ip-api batch endpoint
+    IP_LOCATION_ONLINE_BATCH_WAIT_SECONDS: float = 1  # max wait to fill a batch
+
+    # User agent (in-process LRU of parsed user agent strings)
+    USER_AGENT_PARSE_CACHE_SIZE: int = 2048
+
+    # Export (rows fetched per server-side cursor round trip)
+    EXPORT_CHUNK_SIZE: int = 2000
+
+    # ETag (generation counters of the log tables)
+    ETAG_REDIS_PREFIX: str = 'boilerplate:etag'
+
+    # Outbox (tasks recorded in the database transaction, relayed to Celery)
+    OUTBOX_RELAY_INTERVAL_SECONDS: int = 5
+    OUTBOX_RELAY_BATCH_SIZE: int = 100
+    OUTBOX_RELAY_MAX_BATCHES: int = 50  # per relay run, the next run picks up the rest
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_DEDUP_REDIS_PREFIX: str = 'boilerplate:outbox:delivered'
+    OUTBOX_DEDUP_EXPIRE_SECONDS: int = 60 * 60 * 24 * 7
+    OUTBOX_DEDUP_CLAIM_SECONDS: int = 60 * 10  # lease of a delivery being processed
 
     # Opera log
     OPERA_LOG_PATH_EXCLUDE: list[str] = [
@@ -211,6 +244,12 @@ class Settings(BaseSettings):
         f'{FASTAPI_API_V1_PATH}/oauth2/github/callback',
         f'{FASTAPI_API_V1_PATH}/oauth2/linux-do/callback',
     ]
+    # Reads of the operation log itself: logging them would change the list (and its ETag) on every poll
+    OPERA_LOG_READ_PATH_EXCLUDE: list[str] = [
+        f'/admin{FASTAPI_API_V1_PATH}/opera_log',
+        f'/admin{FASTAPI_API_V1_PATH}/opera_log/',
+        f'/admin{FASTAPI_API_V1_PATH}/opera_log/export',
+    ]
     OPERA_LOG_ENCRYPT_TYPE: int = 1  # 0: AES (performance loss); 1: md5; 2: ItsDangerous; 3: no encryption, others: replace with ******
     OPERA_LOG_ENCRYPT_KEY_INCLUDE: list[str] = [  # Will encrypt the value corresponding to the interface entry parameter
         'password',
@@ -218,6 +257,31 @@ class Settings(BaseSettings):
         'new_password',
         'confirm_password',
     ]
+    OPERA_LOG_ARGS_MAX_BODY_SIZE: int = 64 * 1024  # larger bodies are streamed through, only their size is logged
+    OPERA_LOG_ARGS_CONTENT_TYPES: list[str] = [  # bodies read and logged, others (uploads...) are never buffered
+        'application/json',
+        'application/x-www-form-urlencoded',
+    ]
+    OPERA_LOG_QUEUE_SIZE: int = 10000  # logs waiting to be written, producers wait then drop beyond
+    OPERA_LOG_QUEUE_FULL_WAIT_SECONDS: float = 0.5
+    OPERA_LOG_BATCH_SIZE: int = 500  # logs per bulk insert
+    OPERA_LOG_FLUSH_INTERVAL_SECONDS: float = 1  # max delay before a partial batch is written
+    OPERA_LOG_SHUTDOWN_TIMEOUT_SECONDS: float = 10
+
+    # Veille
+    VEILLE_SHARED_CRAWL: bool = True  # Queries inside the same window share one crawl + extraction pass
+    VEILLE_CRAWL_WINDOW_SECONDS: int = 60 * 60 * 6
+    VEILLE_CRAWL_LOCK_SECONDS: int = 60 * 30  # must cover a full crawl + extraction pass
+    VEILLE_CRAWL_WAIT_SECONDS: int = 60 * 35
+    VEILLE_CRAWL_REDIS_PREFIX: str = 'boilerplate:veille:crawl'
+    VEILLE_CACHE_REDIS_PREFIX: str = 'boilerplate:veille:cache'
+    VEILLE_CACHE_EXPIRE_SECONDS: int = 60 * 10
+    VEILLE_LLM_MAX_RETRIES: int = 2  # per analysis call, with exponential backoff
+    VEILLE_LLM_BATCH_SIZE: int = 1  # articles per analysis request, 1 disables batching
+    VEILLE_LLM_BATCH_MAX_CHARS: int = 2500  # only articles up to this length are batched
+    VEILLE_LLM_MAX_CALLS_PER_MINUTE: int = 30  # pacing of the bulk re-analysis job
+    VEILLE_REANALYSIS_PAGE_SIZE: int = 50  # articles per page, a checkpoint is saved after each page
+    VEILLE_REANALYSIS_REDIS_PREFIX: str = 'boilerplate:veille:reanalysis'
 
     GOOGLE_CLIENT_ID: str = "your-google-client-id"
     GOOGLE_SECRET_KEY: str = "your-google-secret-key"
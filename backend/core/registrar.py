@@ -12,12 +12,15 @@ from backend.common.log import set_customize_logfile, setup_logging
 from backend.core.conf import settings
 from backend.core.path_conf import STATIC_DIR
 from backend.database.db_postgres import create_table
+from backend.app.admin.service.opera_log_writer import opera_log_writer
+from backend.common.security.user_cache import current_user_cache
 from backend.database.db_redis import redis_client
 from backend.middleware.jwt_auth_middleware import JwtAuthMiddleware
 from backend.middleware.opera_log_middleware import OperaLogMiddleware
 from backend.middleware.state_middleware import StateMiddleware
 from backend.middleware.i18n_middleware import I18nMiddleware
 from backend.utils.demo_site import demo_site
+from backend.utils.ip_api import ip_api_client
 from backend.utils.health_check import ensure_unique_route_names, http_limit_callback
 from backend.utils.serializers import MsgSpecJSONResponse
 
@@ -42,8 +45,19 @@ async def register_init(app: FastAPI):
         http_callback=http_limit_callback,
     )
 
+    # Listen to user cache invalidations
+    current_user_cache.start()
+    # Start the operation log writer
+    opera_log_writer.start()
+
     yield
 
+    # Write the queued operation logs
+    await opera_log_writer.stop()
+    # Stop listening to user cache invalidations
+    await current_user_cache.stop()
+    # Close the ip-api connection pool
+    await ip_api_client.close()
     # Closing a redis connection
     await redis_client.close()
     # Close limiter
@@ -1,8 +1,10 @@
-from sqlalchemy import Select
+from sqlalchemy import Select, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy_crud_plus import CRUDPlus
 
+from backend.core.conf import settings
 from backend.models import LoginLog
+from backend.utils.response_cache import GenerationCounter
 from backend.app.admin.schema.login_log import CreateLoginLogParam
 
 
@@ -45,14 +47,19 @@ class CRUDLoginLog(CRUDPlus[LoginLog]):
         """
         return await self.delete_model_by_column(db, allow_multiple=True, id__in=pk)
 
-    async def delete_all(self, db: AsyncSession) -> int:
+    async def delete_all(self, db: AsyncSession) -> bool:
         """
-        Delete all login logs
+        Delete all login logs, truncating every partition instead of deleting row by row
 
         :param db:
-        :return:
+        :return: Whether there were logs to delete
         """
-        return await self.delete_model_by_column(db, allow_multiple=True)
+        exists = await db.scalar(select(select(self.model.id).limit(1).exists()))
+        if exists:
+            await db.execute(text(f'TRUNCATE TABLE {self.model.__tablename__}'))
+        return bool(exists)
 
 
 login_log_dao: CRUDLoginLog = CRUDLoginLog(LoginLog)
+# Bumped on every write, used to build the ETag of the list endpoint
+login_log_generation = GenerationCounter(f'{settings.ETAG_REDIS_PREFIX}:login_log')
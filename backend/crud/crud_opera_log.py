@@ -1,8 +1,10 @@
-from sqlalchemy import Select
+from sqlalchemy import Select, insert, select, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.crud.crud_base import CRUDBase
 
+from backend.core.conf import settings
 from backend.models import OperaLog
+from backend.utils.response_cache import GenerationCounter
 from backend.app.admin.schema.opera_log import CreateOperaLogParam
 
 
@@ -35,6 +37,16 @@ class CRUDOperaLogDao(CRUDBase[OperaLog]):
         """
         await self.create_model(db, obj_in)
 
+    async def create_many(self, db: AsyncSession, objs: list[CreateOperaLogParam]) -> None:
+        """
+        Bulk creating operation logs, a single multi-row insert without loading ORM instances
+
+        :param db:
+        :param objs:
+        :return:
+        """
+        await db.execute(insert(self.model), [obj.model_dump() for obj in objs])
+
     async def delete(self, db: AsyncSession, pk: list[int]) -> int:
         """
         Delete operation log
@@ -45,14 +57,19 @@ class CRUDOperaLogDao(CRUDBase[OperaLog]):
         """
         return await self.delete_model_by_column(db, allow_multiple=True, id__in=pk)
 
-    async def delete_all(self, db: AsyncSession) -> int:
+    async def delete_all(self, db: AsyncSession) -> bool:
         """
-        Delete all operation logs
+        Delete all operation logs, truncating every partition instead of deleting row by row
 
         :param db:
-        :return:
+        :return: Whether there were logs to delete
         """
-        return await self.delete_model_by_column(db, allow_multiple=True)
+        exists = await db.scalar(select(select(self.model.id).limit(1).exists()))
+        if exists:
+            await db.execute(text(f'TRUNCATE TABLE {self.model.__tablename__}'))
+        return bool(exists)
 
 
 opera_log_dao: CRUDOperaLogDao = CRUDOperaLogDao(OperaLog)
+# Bumped on every write, used to build the ETag of the list endpoint
+opera_log_generation = GenerationCounter(f'{settings.ETAG_REDIS_PREFIX}:opera_log')
@@ -0,0 +1,75 @@
+from typing import Any, Sequence
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.crud.crud_base import CRUDBase
+from backend.models import OutboxMessage
+from backend.utils.timezone import timezone
+
+
+class CRUDOutboxDao(CRUDBase[OutboxMessage]):
+    def add(self, db: AsyncSession, task_name: str, args: list[Any] | None = None, **kwargs) -> OutboxMessage:
+        """
+        Record a task in the current transaction, it is sent to the broker by the relay once committed
+
+        :param db:
+        :param task_name: Celery task name
+        :param args: Task positional arguments
+        :param kwargs: Task keyword arguments
+        :return:
+        """
+        message = OutboxMessage(task_name=task_name, payload={'args': args or [], 'kwargs': kwargs})
+        db.add(message)
+        return message
+
+    async def claim_pending(self, db: AsyncSession, limit: int, max_attempts: int) -> Sequence[OutboxMessage]:
+        """
+        Lock a batch of pending messages, rows already locked by another relay are skipped
+
+        :param db:
+        :param limit:
+        :param max_attempts: Messages that failed this many times are left for inspection
+        :return:
+        """
+        stmt = (
+            select(self.model)
+            .where(self.model.dispatched_time.is_(None), self.model.attempts < max_attempts)
+            .order_by(self.model.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        return (await db.execute(stmt)).scalars().all()
+
+    async def mark_dispatched(self, db: AsyncSession, pk: list[int]) -> None:
+        """
+        Mark messages as handed to the broker
+
+        :param db:
+        :param pk:
+        :return:
+        """
+        if pk:
+            await db.execute(
+                update(self.model)
+                .where(self.model.id.in_(pk))
+                .values(dispatched_time=timezone.now(), attempts=self.model.attempts + 1, last_error=None)
+            )
+
+    async def mark_failed(self, db: AsyncSession, pk: int, error: str) -> None:
+        """
+        Record a failed relay attempt, the message stays pending
+
+        :param db:
+        :param pk:
+        :param error:
+        :return:
+        """
+        await db.execute(
+            update(self.model)
+            .where(self.model.id == pk)
+            .values(attempts=self.model.attempts + 1, last_error=error)
+        )
+
+
+outbox_dao: CRUDOutboxDao = CRUDOutboxDao(OutboxMessage)
@@ -1,47 +1,271 @@
 # backend/app/crud/crud_veille.py
 
+from datetime import date, datetime, time, timedelta
+
+from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import desc
-from typing import List, Optional
+from sqlalchemy import BigInteger, Date, Integer, and_, any_, bindparam, cast, delete, func, insert, literal, or_, text, update
+from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import ARRAY, REGCONFIG
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+from ..core.conf import settings
+from .crud_outbox import outbox_dao
 from ..models import veille as veille_model
+from ..utils.response_cache import ResponseCache
+from ..utils.timezone import timezone
+
+# Cache Redis des réponses de lecture (liste, détail), invalidé par génération à chaque écriture
+article_cache = ResponseCache(settings.VEILLE_CACHE_REDIS_PREFIX, settings.VEILLE_CACHE_EXPIRE_SECONDS)
+
+def normalize_published_at(date: Optional[str]) -> Optional[datetime]:
+    """Normalise la date brute de l'extraction ("N/A", "2025-01-31", ISO 8601...) en datetime avec fuseau."""
+    if not date:
+        return None
+    try:
+        published_at = datetime.fromisoformat(date.strip())
+    except ValueError:
+        return None
+    if published_at.tzinfo is None:
+        published_at = published_at.replace(tzinfo=timezone.tz_info)
+    return published_at
+
 
 # --- Fonctions de Lecture (Read) ---
-async def get_article_by_id(db: AsyncSession, article_id: int) -> Optional[veille_model.Article]:
-    """Récupère un article par sa clé primaire (ID)."""
-    result = await db.execute(select(veille_model.Article).filter(veille_model.Article.id == article_id))
+async def get_article_by_id(db: AsyncSession, article_id: int, with_body: bool = False) -> Optional[veille_model.Article]:
+    """Récupère un article par sa clé primaire (ID) ; `with_body` charge aussi son contenu complet."""
+    query = select(veille_model.Article).filter(veille_model.Article.id == article_id)
+    if with_body:
+        query = query.options(selectinload(veille_model.Article.body))
+    result = await db.execute(query)
     return result.scalars().first()
 
+# Colonnes renvoyées par défaut par la liste : `content` et `analysis` sont volumineux
+# et ne sont chargés que sur demande explicite (`fields=`).
+ARTICLE_LIST_FIELDS = ('id', 'url', 'title', 'source', 'published', 'date', 'published_at', 'score_pertinence', 'analysis_version', 'error', 'created_time', 'updated_time')
+ARTICLE_OPTIONAL_FIELDS = ('content', 'analysis')
+# Tris disponibles et colonne de tri associée (toujours renvoyée car nécessaire au curseur)
+ARTICLE_SORT_FIELDS = {'score': 'score_pertinence', 'recent': 'published_at'}
+
+
+def _select_article_columns(columns: Sequence[str]):
+    """
+    Select des colonnes demandées ; `content` est lu dans `article_body` par jointure externe,
+    la table `article` n'est donc parcourue seule que si le contenu n'est pas demandé.
+    """
+    article, body = veille_model.Article, veille_model.ArticleBody
+    query = select(*(body.content.label('content') if name == 'content' else getattr(article, name) for name in columns))
+    if 'content' in columns:
+        query = query.select_from(article).outerjoin(body, body.article_id == article.id)
+    return query
+
+
+def _escape_like(value: str) -> str:
+    """Échappe les jokers LIKE d'une saisie utilisateur."""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
 async def get_articles(
     db: AsyncSession,
     published: Optional[bool] = None,
-    score_min: Optional[int] = None
-) -> List[veille_model.Article]:
-    """Récupère une liste d'articles avec filtres."""
-    query = select(veille_model.Article)
+    score_min: Optional[int] = None,
+    score_max: Optional[int] = None,
+    impact_afrique: Optional[str] = None,
+    analysis_contains: Optional[Dict[str, Any]] = None,
+    published_after: Optional[datetime] = None,
+    published_before: Optional[datetime] = None,
+    sort: str = 'score',
+    limit: int = 20,
+    after: Optional[Tuple[Any, int]] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Récupère une page d'articles avec filtres.
+
+    Pagination par curseur (keyset) sur `(<colonne de tri> DESC NULLS LAST, id DESC)`, la colonne
+    de tri étant `score_pertinence` (`sort='score'`) ou `published_at` (`sort='recent'`) :
+    `after` est le couple `(valeur de tri, id)` du dernier article de la page précédente.
+    Les fenêtres `published_after` / `published_before` sont des parcours d'intervalle sur les
+    index `(published, published_at)` et `(score_pertinence, published_at)`.
+    Seules les colonnes de `fields` sont lues (par défaut `ARTICLE_LIST_FIELDS`).
+    Les filtres sur `analysis` (JSONB) sont exécutés en SQL : recherche de texte sur
+    `impact_afrique` (index trigramme) et inclusion `@>` (index GIN `jsonb_path_ops`).
+    """
+    article = veille_model.Article
+    sort_name = ARTICLE_SORT_FIELDS[sort]
+    sort_column = getattr(article, sort_name)
+    columns = list(dict.fromkeys(['id', sort_name, *(fields or ARTICLE_LIST_FIELDS)]))
+    query = _select_article_columns(columns)
     if published is not None:
-        query = query.filter(veille_model.Article.published == published)
+        query = query.filter(article.published == published)
     if score_min is not None:
-        query = query.filter(veille_model.Article.score_pertinence >= score_min)
-    
-    query = query.order_by(desc(veille_model.Article.score_pertinence))
+        query = query.filter(article.score_pertinence >= score_min)
+    if score_max is not None:
+        query = query.filter(article.score_pertinence <= score_max)
+    if impact_afrique:
+        query = query.filter(article.analysis['impact_afrique'].astext.ilike(f'%{_escape_like(impact_afrique)}%', escape='\\'))
+    if analysis_contains:
+        query = query.filter(article.analysis.contains(analysis_contains))
+    if published_after is not None:
+        query = query.filter(article.published_at >= published_after)
+    if published_before is not None:
+        query = query.filter(article.published_at < published_before)
+    if after is not None:
+        after_key, after_id = after
+        if after_key is None:
+            query = query.filter(sort_column.is_(None), article.id < after_id)
+        else:
+            query = query.filter(or_(
+                sort_column < after_key,
+                and_(sort_column == after_key, article.id < after_id),
+                sort_column.is_(None),
+            ))
+
+    query = query.order_by(sort_column.desc().nulls_last(), article.id.desc()).limit(limit)
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings().all()]
+
+def get_articles_export_select(
+    published: Optional[bool] = None,
+    score_min: Optional[int] = None,
+    fields: Optional[Sequence[str]] = None,
+):
+    """Requête d'export (lecture en flux par curseur serveur), triée par id."""
+    article = veille_model.Article
+    columns = list(dict.fromkeys(['id', *(fields or ARTICLE_LIST_FIELDS)]))
+    query = _select_article_columns(columns)
+    if published is not None:
+        query = query.filter(article.published == published)
+    if score_min is not None:
+        query = query.filter(article.score_pertinence >= score_min)
+    return query.order_by(article.id)
+
+# Configurations Postgres de la recherche plein texte, par langue
+SEARCH_CONFIGS = {'fr': 'french', 'en': 'english'}
+SEARCH_HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=35, MinWords=15'
+
+
+async def search_articles(
+    db: AsyncSession,
+    q: str,
+    lang: str = 'fr',
+    published: Optional[bool] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Recherche plein texte sur le titre, le contenu et les champs clés de l'analyse.
+
+    La correspondance et le classement (`ts_rank_cd`) s'appuient sur l'index GIN de la langue ;
+    les extraits surlignés (`ts_headline`, coûteux) ne sont calculés que pour la page renvoyée.
+    """
+    article, body = veille_model.Article, veille_model.ArticleBody
+    config = cast(SEARCH_CONFIGS[lang], REGCONFIG)
+    vector = body.search_vector_fr if lang == 'fr' else body.search_vector_en
+    tsquery = func.websearch_to_tsquery(config, q)
+    rank = func.ts_rank_cd(vector, tsquery).label('rank')
+
+    page = select(body.article_id.label('id'), rank).filter(vector.op('@@')(tsquery))
+    if published is not None:
+        page = page.join(article, article.id == body.article_id).filter(article.published == published)
+    page = page.order_by(rank.desc(), body.article_id.desc()).limit(limit).offset(offset).subquery()
+
+    query = (
+        select(
+            *(getattr(article, name) for name in ARTICLE_LIST_FIELDS),
+            page.c.rank,
+            func.ts_headline(config, article.title, tsquery, SEARCH_HEADLINE_OPTIONS).label('title_highlight'),
+            func.ts_headline(config, func.coalesce(body.content, ''), tsquery, SEARCH_HEADLINE_OPTIONS).label('content_highlight'),
+        )
+        .join(page, page.c.id == article.id)
+        .join(body, body.article_id == article.id)
+        .order_by(page.c.rank.desc(), article.id.desc())
+    )
     result = await db.execute(query)
-    articles_sequence = result.scalars().all()
-    return list(articles_sequence)
+    return [dict(row) for row in result.mappings().all()]
+
+async def get_articles_to_reanalyze(
+    db: AsyncSession, version: str, after_id: int = 0, limit: int = 50
+) -> List[Tuple[int, str, str, str]]:
+    """
+    Page d'articles `(id, url, source, content)` analysés par une autre version de prompt que `version`,
+    triés par ID à partir de `after_id` (exclu). Les articles sans contenu exploitable sont ignorés.
+    """
+    article, body = veille_model.Article, veille_model.ArticleBody
+    query = (
+        select(article.id, article.url, article.source, body.content)
+        .join(body, body.article_id == article.id)
+        .filter(
+            article.id > after_id,
+            article.analysis.is_not(None),
+            article.analysis_version.is_distinct_from(version),
+            func.length(body.content) > 250,
+        )
+        .order_by(article.id)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return [tuple(row) for row in result.all()]
 
 # --- Fonctions d'Écriture (Create, Update, Delete) ---
-async def create_or_update_article(db: AsyncSession, article_data: dict) -> veille_model.Article:
+async def refresh_search_vectors(db: AsyncSession, article_id: int) -> None:
+    """Recalcule les vecteurs de recherche d'un article à partir de `article` et `article_body`."""
+    body = veille_model.ArticleBody
+    await db.execute(
+        update(body)
+        .where(body.article_id == veille_model.Article.id, body.article_id == article_id)
+        .values(
+            search_vector_fr=text(veille_model.search_vector_expression('french')),
+            search_vector_en=text(veille_model.search_vector_expression('english')),
+        )
+    )
+
+async def backfill_published_at(db: AsyncSession, after_id: int, limit: int) -> Optional[int]:
+    """
+    Renseigne `published_at` des articles enregistrés avant la normalisation des dates, une page d'ID à la fois.
+    Renvoie le dernier ID parcouru (point de reprise), None une fois la table parcourue.
+    """
+    article = veille_model.Article
+    rows = (await db.execute(
+        select(article.id, article.date)
+        .where(article.id > after_id, article.published_at.is_(None), article.date.is_not(None))
+        .order_by(article.id)
+        .limit(limit)
+    )).all()
+    if not rows:
+        return None
+    values = [
+        {'b_id': article_id, 'b_published_at': published_at}
+        for article_id, raw_date in rows
+        if (published_at := normalize_published_at(raw_date)) is not None
+    ]
+    if values:
+        table = article.__table__
+        await db.execute(
+            update(table).where(table.c.id == bindparam('b_id')).values(published_at=bindparam('b_published_at')),
+            values,
+        )
+    return rows[-1][0]
+
+async def create_or_update_article(db: AsyncSession, article_data: dict, redis: Optional[Redis] = None) -> veille_model.Article:
     """
     Crée un nouvel article ou met à jour un article existant basé sur son URL.
     Parfaitement compatible avec le modèle `Article` utilisant les dataclasses.
+    Le contenu est écrit dans `article_body` (seulement s'il est fourni) et les vecteurs
+    de recherche sont recalculés dans la même transaction.
+    Invalide le cache des réponses (`redis` : client dédié hors de la boucle de l'API, ex. worker Celery).
     """
     # On utilise `await` car la fonction `get_article_by_url` est asynchrone
-    result = await db.execute(select(veille_model.Article).filter(veille_model.Article.url == article_data["url"]))
+    result = await db.execute(
+        select(veille_model.Article)
+        .filter(veille_model.Article.url == article_data["url"])
+        .options(selectinload(veille_model.Article.body))
+    )
     db_article = result.scalars().first()
-    
+
     # On prépare un dictionnaire contenant uniquement les champs valides pour le modèle
-    valid_fields = {k: v for k, v in article_data.items() if hasattr(veille_model.Article, k)}
+    valid_fields = {k: v for k, v in article_data.items() if k in veille_model.Article.__mapper__.column_attrs}
 
     if db_article:
         # --- MISE À JOUR ---
@@ -58,16 +282,156 @@ async def create_or_update_article(db: AsyncSession, article_data: dict) -> veil
         db_article = veille_model.Article(**valid_fields)
         db.add(db_article)
         print(f"Création d'un nouvel article : {db_article.url}")
-        
+
+    # Le corps existe toujours, même vide, pour que titre et analyse restent cherchables
+    if db_article.body is None:
+        db_article.body = veille_model.ArticleBody(content=article_data.get("content"))
+    elif "content" in article_data:
+        db_article.body.content = article_data["content"]
+
+    await db.flush()
+    await refresh_search_vectors(db, db_article.id)
     await db.commit()
     await db.refresh(db_article)
+    await article_cache.bump(redis)
     return db_article
 
-async def update_publish_status(db: AsyncSession, article_id: int, published: bool) -> Optional[veille_model.Article]:
-    """Met à jour le statut de publication d'un article."""
+async def update_article_analysis(
+    db: AsyncSession, article_id: int, analysis: dict, version: str, llm_usage: Optional[dict] = None
+) -> None:
+    """
+    Remplace l'analyse d'un article et recalcule ses vecteurs de recherche.
+    Pas de commit : l'appelant valide par lot et invalide le cache une fois par lot.
+    """
+    await db.execute(
+        update(veille_model.Article)
+        .where(veille_model.Article.id == article_id)
+        .values(
+            analysis=analysis,
+            analysis_version=version,
+            llm_usage=llm_usage,
+            score_pertinence=analysis.get("score_pertinence", 0),
+            error=None,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await refresh_search_vectors(db, article_id)
+
+def add_llm_call_log(db: AsyncSession, article_url: str, source: Optional[str], usage: dict) -> None:
+    """Ajoute un appel LLM au journal ; enregistré au prochain commit de la session."""
+    db.add(veille_model.LLMCallLog(article_url=article_url, source=source, **usage))
+
+# Tranches de taille de contenu des agrégats LLM (le contenu est tronqué à 8000 caractères)
+LLM_USAGE_LENGTH_BUCKET = 2000
+
+async def rollup_llm_usage(db: AsyncSession, day: date) -> int:
+    """
+    (Re)calcule les agrégats LLM d'une journée à partir du journal des appels.
+    Idempotent : les lignes du jour sont remplacées.
+    """
+    log, daily = veille_model.LLMCallLog, veille_model.LLMUsageDaily
+    start = datetime.combine(day, time.min, tzinfo=timezone.tz_info)
+    source = func.coalesce(log.source, '')
+    length_bucket = (log.content_length // LLM_USAGE_LENGTH_BUCKET) * LLM_USAGE_LENGTH_BUCKET
+    aggregates = (
+        select(
+            literal(day, Date),
+            source,
+            log.model,
+            log.prompt_version,
+            length_bucket,
+            func.count(),
+            func.count().filter(log.outcome != 'success'),
+            func.coalesce(func.sum(log.retries), 0),
+            func.coalesce(func.sum(log.prompt_tokens), 0),
+            func.coalesce(func.sum(log.completion_tokens), 0),
+            func.coalesce(func.sum(log.latency_ms), 0),
+        )
+        .filter(log.created_time >= start, log.created_time < start + timedelta(days=1))
+        .group_by(source, log.model, log.prompt_version, length_bucket)
+    )
+    await db.execute(delete(daily).where(daily.day == day))
+    result = await db.execute(
+        insert(daily).from_select(
+            ['day', 'source', 'model', 'prompt_version', 'length_bucket', 'calls', 'failures', 'retries',
+             'prompt_tokens', 'completion_tokens', 'latency_ms'],
+            aggregates,
+        )
+    )
+    await db.commit()
+    return result.rowcount
+
+async def get_llm_usage(
+    db: AsyncSession, since: date, group_by: Sequence[str] = ('source',)
+) -> List[Dict[str, Any]]:
+    """Agrégats LLM depuis `since`, regroupés par les dimensions demandées et triés par tokens consommés."""
+    daily = veille_model.LLMUsageDaily
+    dimensions = [getattr(daily, name) for name in group_by]
+
+    def total(expression):
+        # sum() d'entiers renvoie un numeric : ramené en entier pour la sérialisation JSON
+        return cast(func.sum(expression), BigInteger)
+
+    total_tokens = total(daily.prompt_tokens + daily.completion_tokens)
+    query = (
+        select(
+            *dimensions,
+            total(daily.calls).label('calls'),
+            total(daily.failures).label('failures'),
+            total(daily.retries).label('retries'),
+            total(daily.prompt_tokens).label('prompt_tokens'),
+            total(daily.completion_tokens).label('completion_tokens'),
+            total_tokens.label('total_tokens'),
+            total(daily.latency_ms).label('latency_ms'),
+            cast(func.sum(daily.latency_ms) / func.nullif(func.sum(daily.calls), 0), BigInteger).label('avg_latency_ms'),
+        )
+        .filter(daily.day >= since)
+        .group_by(*dimensions)
+        .order_by(total_tokens.desc())
+    )
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings().all()]
+
+# Tâche Celery de diffusion des articles publiés, enregistrée dans l'outbox
+DISTRIBUTE_ARTICLES_TASK = "veille.distribute_articles"
+
+async def update_publish_status(db: AsyncSession, article_id: int, published: bool, redis: Optional[Redis] = None) -> Optional[veille_model.Article]:
+    """
+    Met à jour le statut de publication d'un article et invalide le cache des réponses.
+    Une publication enregistre sa diffusion dans l'outbox, dans la même transaction.
+    """
     db_article = await get_article_by_id(db, article_id=article_id)
     if db_article:
+        if published and not db_article.published:
+            outbox_dao.add(db, DISTRIBUTE_ARTICLES_TASK, [[article_id]])
         db_article.published = published
         await db.commit()
         await db.refresh(db_article)
-    return db_article
\ No newline at end of file
+        await article_cache.bump(redis)
+    return db_article
+
+async def bulk_update_publish_status(
+    db: AsyncSession, article_ids: Sequence[int], published: bool, redis: Optional[Redis] = None
+) -> List[int]:
+    """
+    Met à jour le statut de publication de plusieurs articles en une seule requête
+    (`UPDATE ... WHERE id = ANY(:ids) RETURNING id`).
+    Seuls les articles dont le statut change sont modifiés : les IDs renvoyés sont ceux effectivement basculés.
+    Les articles publiés sont diffusés par un seul message d'outbox, écrit dans la même transaction.
+    """
+    article = veille_model.Article
+    result = await db.execute(
+        update(article)
+        .where(article.id == any_(bindparam('article_ids', list(article_ids), type_=ARRAY(Integer))))
+        .where(article.published.is_not(published))
+        .values(published=published)
+        .returning(article.id)
+        .execution_options(synchronize_session=False)
+    )
+    changed_ids = list(result.scalars().all())
+    if published and changed_ids:
+        outbox_dao.add(db, DISTRIBUTE_ARTICLES_TASK, [changed_ids])
+    await db.commit()
+    if changed_ids:
+        await article_cache.bump(redis)
+    return changed_ids
@@ -1,8 +1,9 @@
+import asyncio
 import sys
 from typing import Annotated, Generator
 from uuid import uuid4
 from sqlalchemy import MetaData
-from sqlalchemy import URL
+from sqlalchemy import URL, text
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from collections.abc import AsyncGenerator
 from fastapi import Depends
@@ -10,6 +11,8 @@ from fastapi import Depends
 from backend.common.log import log
 from backend.common.model import MappedBase
 from backend.core.conf import settings
+from backend.database.partition import maintain_log_partitions
+from backend.utils.timezone import timezone
 
 # --- CONFIG DATABASE URL ---
 SQLALCHEMY_DATABASE_URL = (
@@ -94,11 +97,31 @@ def get_db() -> Generator[AsyncSession, None, None]:
             pass
 
 
+# --- CELERY TASKS ---
+def run_async(coro):
+    """
+    Run a coroutine in a new event loop (Celery task), then dispose of the pooled connections.
+    asyncpg connections are bound to the loop that opened them: pooled across `asyncio.run`
+    calls, they fail with "attached to a different loop" from the second task on.
+    """
+    async def _run():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+
+    return asyncio.run(_run())
+
+
 # --- CREATE TABLES ---
 async def create_table():
     """Creating Database Tables"""
     async with async_engine.begin() as conn:
+        # Required by the trigram indexes (article.analysis ->> 'impact_afrique')
+        await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
         await conn.run_sync(MappedBase.metadata.create_all)
+        # Partitions of the log tables for the upcoming months (retention is left to the scheduled task)
+        await maintain_log_partitions(conn, timezone.now().date(), retention=False)
 
 
 # --- UUID HELPER ---
@@ -0,0 +1,148 @@
+import re
+
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from backend.common.log import log
+from backend.core.conf import settings
+
+# Log tables range-partitioned by month on `created_time`
+PARTITIONED_LOG_TABLES = ('opera_log', 'login_log')
+
+
+def month_start(day: date, offset: int = 0) -> date:
+    """
+    First day of the month of `day`, shifted by `offset` months
+
+    :param day:
+    :param offset: Months to add (negative to go back)
+    :return:
+    """
+    month = day.year * 12 + day.month - 1 + offset
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f'{table}_p{month:%Y%m}'
+
+
+async def is_partitioned(conn: AsyncConnection, table: str) -> bool:
+    """
+    Whether the table exists and is partitioned (tables created before partitioning are left untouched)
+
+    :param conn:
+    :param table:
+    :return:
+    """
+    relkind = await conn.scalar(text('SELECT relkind FROM pg_class WHERE oid = to_regclass(:table)'), {'table': table})
+    return relkind == 'p'
+
+
+async def create_partitions(conn: AsyncConnection, table: str, first: date, months: int) -> list[str]:
+    """
+    Create the monthly partitions of a table from the month of `first`, and its default partition
+
+    Bounds are UTC month starts. Rows of a month already written to the default partition (e.g. a month
+    that was not created ahead of time) are moved to the new partition: the default partition is detached,
+    the partition created, the rows moved and the default partition re-attached, in one savepoint. The
+    table is locked meanwhile, writes to it wait for the move.
+
+    :param conn:
+    :param table:
+    :param first: Day of the first month
+    :param months: Number of months
+    :return: Names of the partitions created
+    """
+    created = []
+    existing = set(await list_partitions(conn, table))
+    default = f'{table}_default'
+    for offset in range(months):
+        start, end = month_start(first, offset), month_start(first, offset + 1)
+        name = partition_name(table, start)
+        if name in existing:
+            continue
+        bounds = f"'{start} 00:00:00+00'", f"'{end} 00:00:00+00'"
+        try:
+            async with conn.begin_nested():
+                move = default in existing and await conn.scalar(text(
+                    f'SELECT EXISTS (SELECT 1 FROM {default} '
+                    f'WHERE created_time >= {bounds[0]} AND created_time < {bounds[1]})'
+                ))
+                if move:
+                    await conn.execute(text(f'ALTER TABLE {table} DETACH PARTITION {default}'))
+                await conn.execute(text(
+                    f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM ({bounds[0]}) TO ({bounds[1]})'
+                ))
+                if move:
+                    result = await conn.execute(text(
+                        f'WITH moved AS (DELETE FROM {default} '
+                        f'WHERE created_time >= {bounds[0]} AND created_time < {bounds[1]} RETURNING *) '
+                        f'INSERT INTO {name} SELECT * FROM moved'
+                    ))
+                    await conn.execute(text(f'ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT'))
+                    log.info(f'Partition {name}: {result.rowcount} rows moved from {default}')
+        except Exception as e:
+            log.error(f'Partition creation failure ({name}): {e}')
+            continue
+        created.append(name)
+    await conn.execute(text(f'CREATE TABLE IF NOT EXISTS {default} PARTITION OF {table} DEFAULT'))
+    return created
+
+
+async def list_partitions(conn: AsyncConnection, table: str) -> list[str]:
+    result = await conn.execute(
+        text(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = to_regclass(:table)'
+        ),
+        {'table': table},
+    )
+    return list(result.scalars())
+
+
+async def drop_partitions_before(conn: AsyncConnection, table: str, before: date, detach: bool = False) -> list[str]:
+    """
+    Remove the monthly partitions older than the month of `before`: a catalog operation, no row is scanned
+
+    :param conn:
+    :param table:
+    :param before: Day of the oldest month kept
+    :param detach: Detach the partitions (kept as standalone tables, e.g. for archiving) instead of dropping them
+    :return: Names of the partitions removed
+    """
+    removed = []
+    pattern = re.compile(rf'{table}_p(\d{{4}})(\d{{2}})')
+    for name in sorted(await list_partitions(conn, table)):
+        match = pattern.fullmatch(name)
+        if match is None or date(int(match[1]), int(match[2]), 1) >= month_start(before):
+            continue
+        await conn.execute(text(f'ALTER TABLE {table} DETACH PARTITION {name}'))
+        if not detach:
+            await conn.execute(text(f'DROP TABLE {name}'))
+        removed.append(name)
+    return removed
+
+
+async def maintain_log_partitions(conn: AsyncConnection, today: date, retention: bool = True) -> dict[str, list[str]]:
+    """
+    Create the partitions of the log tables ahead of time and apply the retention
+
+    :param conn:
+    :param today:
+    :param retention: Also remove the partitions older than `LOG_RETENTION_MONTHS`
+    :return: Names of the partitions removed, by table
+    """
+    removed = {}
+    for table in PARTITIONED_LOG_TABLES:
+        if not await is_partitioned(conn, table):
+            log.warning(f'Table {table} is not partitioned, run `poe upgrade-db log-partitions` to enable partition maintenance')
+            continue
+        await create_partitions(conn, table, today, settings.LOG_PARTITION_PREMAKE_MONTHS + 1)
+        if retention and settings.LOG_RETENTION_MONTHS > 0:
+            removed[table] = await drop_partitions_before(
+                conn, table, month_start(today, -settings.LOG_RETENTION_MONTHS), settings.LOG_RETENTION_DETACH
+            )
+    return removed
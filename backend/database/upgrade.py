@@ -0,0 +1,231 @@
+"""
+One-off upgrades of an existing database
+
+`create_all` only creates missing tables: column type changes, moved data and backfills of existing
+rows are applied by these steps. Every step is idempotent and can be run again safely. Run them
+before deploying the version that needs them, and before any `alembic revision --autogenerate`,
+which would otherwise drop columns whose data has not been moved yet.
+
+    python3 -m database.upgrade <step>
+"""
+import asyncio
+
+import fire
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from backend.core.conf import settings
+from backend.crud import veille as crud_veille
+from backend.crud.crud_login_log import login_log_generation
+from backend.crud.crud_opera_log import opera_log_generation
+from backend.database.db_postgres import async_db_session, async_engine
+from backend.database.db_redis import RedisCli
+from backend.database.partition import create_partitions, is_partitioned, month_start
+from backend.models import Article, ArticleBody, LoginLog, OperaLog
+from backend.models.veille import search_vector_expression
+from backend.utils.timezone import timezone
+
+
+async def _column_type(conn: AsyncConnection, table: str, column: str) -> str | None:
+    return await conn.scalar(
+        text('SELECT data_type FROM information_schema.columns WHERE table_name = :table AND column_name = :column'),
+        {'table': table, 'column': column},
+    )
+
+
+async def _create_indexes(conn: AsyncConnection, table, names: tuple[str, ...]) -> None:
+    for index in table.indexes:
+        if index.name in names:
+            await conn.run_sync(index.create, checkfirst=True)
+
+
+def _run(step) -> None:
+    async def _step():
+        try:
+            await step()
+        finally:
+            await async_engine.dispose()
+
+    asyncio.run(_step())
+
+
+async def _analysis_jsonb() -> None:
+    async with async_engine.begin() as conn:
+        if await _column_type(conn, 'article', 'analysis') == 'json':
+            await conn.execute(text('ALTER TABLE article ALTER COLUMN analysis TYPE JSONB USING analysis::jsonb'))
+        await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        await _create_indexes(conn, Article.__table__, ('ix_article_analysis', 'ix_article_impact_afrique_trgm'))
+
+
+def analysis_jsonb() -> None:
+    """Convert `article.analysis` from JSON to JSONB and create its indexes"""
+    _run(_analysis_jsonb)
+
+
+async def _published_at(page_size: int) -> None:
+    async with async_engine.begin() as conn:
+        await conn.execute(text('ALTER TABLE article ADD COLUMN IF NOT EXISTS published_at TIMESTAMP WITH TIME ZONE'))
+        await _create_indexes(
+            conn,
+            Article.__table__,
+            ('ix_article_published_published_at', 'ix_article_score_pertinence_published_at', 'ix_article_published_at_id'),
+        )
+    after_id = 0
+    while after_id is not None:
+        async with async_db_session.begin() as db:
+            after_id = await crud_veille.backfill_published_at(db, after_id, page_size)
+    redis = RedisCli()
+    try:
+        await crud_veille.article_cache.bump(redis)
+    finally:
+        await redis.close()
+
+
+def published_at(page_size: int = 1000) -> None:
+    """Backfill `article.published_at` from the raw `article.date` of articles ingested before it existed"""
+    _run(lambda: _published_at(page_size))
+
+
+async def _analysis_version() -> None:
+    async with async_engine.begin() as conn:
+        await conn.execute(text('ALTER TABLE article ADD COLUMN IF NOT EXISTS analysis_version VARCHAR(20)'))
+        await _create_indexes(conn, Article.__table__, ('ix_article_analysis_version_id',))
+
+
+def analysis_version() -> None:
+    """Add `article.analysis_version` and its index, articles analysed before it are re-analysed as outdated"""
+    _run(_analysis_version)
+
+
+async def _llm_usage() -> None:
+    async with async_engine.begin() as conn:
+        await conn.execute(text('ALTER TABLE article ADD COLUMN IF NOT EXISTS llm_usage JSONB'))
+
+
+def llm_usage() -> None:
+    """Add `article.llm_usage`, the cost of the last analysis call of an article"""
+    _run(_llm_usage)
+
+
+async def _article_body(page_size: int) -> None:
+    async with async_engine.begin() as conn:
+        await conn.run_sync(ArticleBody.__table__.create, checkfirst=True)
+        # Tables created by an earlier version declared the vectors NOT NULL
+        for column in ('search_vector_fr', 'search_vector_en'):
+            await conn.execute(text(f'ALTER TABLE article_body ALTER COLUMN {column} DROP NOT NULL'))
+        # The content is moved and the old columns dropped in the same transaction
+        if await _column_type(conn, 'article', 'content') is not None:
+            await conn.execute(text(
+                'INSERT INTO article_body (article_id, content) SELECT id, content FROM article '
+                'ON CONFLICT (article_id) DO UPDATE SET content = EXCLUDED.content WHERE article_body.content IS NULL'
+            ))
+            await conn.execute(text(
+                'ALTER TABLE article DROP COLUMN IF EXISTS search_vector_fr, '
+                'DROP COLUMN IF EXISTS search_vector_en, DROP COLUMN content'
+            ))
+    backfill = text(
+        'UPDATE article_body SET '
+        f"search_vector_fr = {search_vector_expression('french')}, "
+        f"search_vector_en = {search_vector_expression('english')} "
+        'FROM article WHERE article_body.article_id = article.id AND article_body.article_id = ANY(:ids)'
+    )
+    while True:
+        async with async_engine.begin() as conn:
+            ids = list((await conn.execute(
+                text(
+                    'SELECT article_id FROM article_body WHERE search_vector_fr IS NULL '
+                    'ORDER BY article_id LIMIT :limit'
+                ),
+                {'limit': page_size},
+            )).scalars())
+            if not ids:
+                break
+            await conn.execute(backfill, {'ids': ids})
+    redis = RedisCli()
+    try:
+        await crud_veille.article_cache.bump(redis)
+    finally:
+        await redis.close()
+
+
+def article_body(page_size: int = 500) -> None:
+    """Move `article.content` to `article_body`, compute its search vectors, then drop the old columns"""
+    _run(lambda: _article_body(page_size))
+
+
+async def _convert_log_table(conn: AsyncConnection, table) -> None:
+    old = f'{table.name}_old'
+    # The index and sequence names are kept by a rename: free them for the partitioned table
+    await conn.execute(text(f'ALTER TABLE {table.name} RENAME TO {old}'))
+    indexes = await conn.execute(
+        text('SELECT indexname FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table'),
+        {'table': old},
+    )
+    for index in list(indexes.scalars()):
+        await conn.execute(text(f'ALTER INDEX {index} RENAME TO {index}_old'))
+    sequence = await conn.scalar(text("SELECT pg_get_serial_sequence(:table, 'id')"), {'table': old})
+    if sequence is not None:
+        await conn.execute(text(f'ALTER SEQUENCE {sequence} RENAME TO {old}_id_seq'))
+    await conn.run_sync(table.create)
+    today = timezone.now().date()
+    first = await conn.scalar(text(f'SELECT min(created_time) FROM {old}'))
+    first = month_start(first.date() if first is not None else today)
+    months = (today.year - first.year) * 12 + today.month - first.month + settings.LOG_PARTITION_PREMAKE_MONTHS + 1
+    await create_partitions(conn, table.name, first, months)
+    # New rows are written to the partitioned table during the copy: their ids follow the old ones
+    await conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), coalesce(max(id), 0) + 1, false) FROM {old}"
+    ))
+
+
+async def _log_partitions(page_size: int, convert: bool) -> None:
+    for table, generation in ((OperaLog.__table__, opera_log_generation), (LoginLog.__table__, login_log_generation)):
+        old = f'{table.name}_old'
+        async with async_engine.begin() as conn:
+            if await conn.scalar(text('SELECT to_regclass(:table)'), {'table': table.name}) is None:
+                continue
+            await conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            if convert and not await is_partitioned(conn, table.name):
+                await _convert_log_table(conn, table)
+            # Also reached by tables left unpartitioned: they still get the listing and search indexes
+            await _create_indexes(conn, table, tuple(index.name for index in table.indexes))
+            copying = await conn.scalar(text('SELECT to_regclass(:table)'), {'table': old}) is not None
+        if not copying:
+            continue
+        columns = ', '.join(column.name for column in table.columns)
+        # Resumable: rows already copied by an interrupted run are skipped
+        async with async_engine.begin() as conn:
+            after_id = await conn.scalar(text(
+                f'SELECT coalesce(max(id), 0) FROM {table.name} WHERE id <= (SELECT max(id) FROM {old})'
+            ))
+        copy = text(
+            f'WITH page AS (SELECT {columns} FROM {old} WHERE id > :after_id ORDER BY id LIMIT :limit), '
+            f'copied AS (INSERT INTO {table.name} ({columns}) SELECT {columns} FROM page ON CONFLICT DO NOTHING) '
+            'SELECT max(id) FROM page'
+        )
+        while after_id is not None:
+            async with async_engine.begin() as conn:
+                after_id = await conn.scalar(copy, {'after_id': after_id, 'limit': page_size})
+        async with async_engine.begin() as conn:
+            await conn.execute(text(f'DROP TABLE {old}'))
+        redis = RedisCli()
+        try:
+            await generation.bump(redis)
+        finally:
+            await redis.close()
+
+
+def log_partitions(page_size: int = 5000, convert: bool = True) -> None:
+    """
+    Convert `opera_log` and `login_log` to tables partitioned by month, and create their indexes
+
+    The old table is renamed, the partitioned table created with its partitions, the rows copied
+    page by page and the old table dropped. New logs are written to the partitioned table from the
+    start of the copy. With `--convert=False`, tables are left unpartitioned and only get the indexes.
+    """
+    _run(lambda: _log_partitions(page_size, convert))
+
+
+if __name__ == '__main__':
+    fire.Fire()
@@ -1,19 +1,36 @@
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from backend.common.log import log
 from backend.utils.timezone import timezone
 
 
-class AccessMiddleware(BaseHTTPMiddleware):
+class AccessMiddleware:
     """Request Log Middleware"""
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        request = Request(scope)
         start_time = timezone.now()
-        response = await call_next(request)
-        end_time = timezone.now()
-        log.info(
-            f'{request.client.host: <15} | {request.method: <8} | {response.status_code: <6} | '
-            f'{request.url.path} | {round((end_time - start_time).total_seconds(), 3) * 1000.0}ms'
-        )
-        return response
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_time = timezone.now()
+            log.info(
+                f'{request.client.host: <15} | {request.method: <8} | {status_code: <6} | '
+                f'{request.url.path} | {round((end_time - start_time).total_seconds(), 3) * 1000.0}ms'
+            )
@@ -1,19 +1,24 @@
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 
-class I18nMiddleware(BaseHTTPMiddleware):
+class I18nMiddleware:
     WHITE_LIST = ['en', 'fr']
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
-        # 1. headers 2. path 3. query string
-        locale = request.headers.get('locale', None) or \
-                 request.path_params.get('locale', None) or \
-                 request.query_params.get('locale', None) or \
-                 'fr'
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
-        if locale not in self.WHITE_LIST:
-            locale = 'fr'
-        request.state.locale = locale
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http':
+            request = Request(scope)
+            # 1. headers 2. path 3. query string
+            locale = request.headers.get('locale', None) or \
+                     request.path_params.get('locale', None) or \
+                     request.query_params.get('locale', None) or \
+                     'fr'
 
-        return await call_next(request)
+            if locale not in self.WHITE_LIST:
+                locale = 'fr'
+            request.state.locale = locale
+
+        await self.app(scope, receive, send)
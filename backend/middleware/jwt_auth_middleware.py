@@ -2,7 +2,6 @@ from typing import Any
 
 from fastapi import Request, Response
 from fastapi.security.utils import get_authorization_scheme_param
-from pydantic_core import from_json
 from starlette.authentication import AuthCredentials, AuthenticationBackend, AuthenticationError
 from starlette.requests import HTTPConnection
 
@@ -10,6 +9,7 @@ from backend.schemas.user import CurrentUserIns
 from backend.common.exception.errors import TokenError
 from backend.common.log import log
 from backend.common.security import jwt
+from backend.common.security.user_cache import current_user_cache
 from backend.core.conf import settings
 from backend.database.db_postgres import async_db_session
 from backend.database.db_redis import redis_client
@@ -33,6 +33,19 @@ class JwtAuthMiddleware(AuthenticationBackend):
         """Override internal authentication error handling"""
         return MsgSpecJSONResponse(content={'code': exc.code, 'msg': exc.msg, 'data': None}, status_code=exc.code)
 
+    @staticmethod
+    async def _load_user(sub: str) -> CurrentUserIns:
+        """Load the user from the database and refresh the Redis user cache"""
+        async with async_db_session() as db:
+            current_user = await jwt.get_current_user(db, sub)
+            user = CurrentUserIns(**select_as_dict(current_user))
+        await redis_client.setex(
+            f'{settings.JWT_USER_REDIS_PREFIX}:{sub}',
+            settings.JWT_USER_REDIS_EXPIRE_SECONDS,
+            user.model_dump_json(),
+        )
+        return user
+
     async def authenticate(self, request: Request) -> tuple[AuthCredentials, CurrentUserIns] | None:
         token = request.headers.get('Authorization')
         if not token:
@@ -46,21 +59,17 @@ class JwtAuthMiddleware(AuthenticationBackend):
             return
 
         try:
-            sub = await jwt.jwt_authentication(token)
-            cache_user = await redis_client.get(f'{settings.JWT_USER_REDIS_PREFIX}:{sub}')
-            if not cache_user:
-                async with async_db_session() as db:
-                    current_user = await jwt.get_current_user(db, sub)
-                    user = CurrentUserIns(**select_as_dict(current_user))
-                    await redis_client.setex(
-                        f'{settings.JWT_USER_REDIS_PREFIX}:{sub}',
-                        settings.JWT_USER_REDIS_EXPIRE_SECONDS,
-                        user.model_dump_json(),
-                    )
-            else:
-                # TODO: it should be replaced with the use of model_validate_json
-                # https://docs.pydantic.dev/latest/concepts/json/#partial-json-parsing
-                user = CurrentUserIns.model_validate(from_json(cache_user, allow_partial=True))
+            # The subject is only known once the token is decoded: peek at the in-process cache first,
+            # then check the token and read the cached user in a single Redis round trip
+            sub = jwt.jwt_decode(token)
+            user = current_user_cache.get(sub)
+            cache_user = await jwt.jwt_verify_with_user(sub, token, fetch_user=user is None)
+            if user is None:
+                if cache_user:
+                    user = CurrentUserIns.model_validate_json(cache_user)
+                else:
+                    user = await current_user_cache.load(sub, lambda: self._load_user(sub))
+                current_user_cache.set(sub, user)
         except TokenError as exc:
             raise _AuthenticationError(code=exc.code, msg=exc.detail, headers=exc.headers)
         except Exception as e:
@@ -1,34 +1,93 @@
+import json
+import re
+
 from asyncio import create_task
 from datetime import datetime
+from urllib.parse import parse_qsl
 
 from asgiref.sync import sync_to_async
-from fastapi import Response
-from starlette.datastructures import UploadFile
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from backend.app.admin.schema.opera_log import CreateOperaLogParam
-from backend.app.admin.service.opera_log_service import OperaLogService
+from backend.app.admin.service.opera_log_writer import opera_log_writer
 from backend.common.dataclasses import RequestCallNext
 from backend.common.enums import OperaLogCipherType, StatusType
 from backend.common.log import log
 from backend.core.conf import settings
 from backend.utils.encrypt import AESCipher, ItsDCipher, Md5Cipher
+from backend.utils.request_parse import RequestInfo
 from backend.utils.trace_id import get_request_trace_id
 
+# Headers of a multipart part, captured without buffering the body
+_MULTIPART_PART = re.compile(rb'content-disposition:\s*form-data;\s*name="([^"]*)"(?:;\s*filename="([^"]*)")?', re.IGNORECASE)
+# Bytes kept between chunks so that part headers split across two chunks are still matched
+_MULTIPART_TAIL_SIZE = 1024
+
+
+class BodyObserver:
+    """
+    Receive channel passing the body through to the application untouched, measuring its size
+
+    For multipart bodies, the part headers are matched on the fly: file fields are recorded with their
+    file name, the file contents are never kept.
+    """
+
+    def __init__(self, receive: Receive, multipart: bool):
+        self.receive = receive
+        self.multipart = multipart
+        self.size = 0
+        self._parts: dict[int, tuple[str, str | None]] = {}
+        self._tail = b''
+        self._tail_offset = 0
+
+    async def __call__(self) -> Message:
+        message = await self.receive()
+        if message['type'] == 'http.request':
+            chunk = message.get('body', b'')
+            self.size += len(chunk)
+            if self.multipart and chunk:
+                self._scan(chunk)
+        return message
+
+    def _scan(self, chunk: bytes) -> None:
+        data = self._tail + chunk
+        for match in _MULTIPART_PART.finditer(data):
+            # Keyed by offset: a header matched again from the tail replaces its earlier, possibly truncated, match
+            filename = match[2].decode('utf-8', 'replace') if match[2] is not None else None
+            self._parts[self._tail_offset + match.start()] = (match[1].decode('utf-8', 'replace'), filename)
+        self._tail = data[-_MULTIPART_TAIL_SIZE:]
+        self._tail_offset += len(data) - len(self._tail)
+
+    def parts(self) -> dict[str, str | None]:
+        """Multipart fields, file fields map to their file name, other fields are not captured"""
+        return {name: filename for name, filename in self._parts.values()}
 
-class OperaLogMiddleware(BaseHTTPMiddleware):
+
+class OperaLogMiddleware:
     """Operation Logging Middleware"""
 
-    async def dispatch(self, request: Request, call_next) -> Response:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
         # Whitelisting of excluded records
+        request = Request(scope, receive)
         path = request.url.path
-        if path in settings.OPERA_LOG_PATH_EXCLUDE or not path.startswith((
+        if (
+            path in settings.OPERA_LOG_PATH_EXCLUDE
+            or (request.method == 'GET' and path in settings.OPERA_LOG_READ_PATH_EXCLUDE)
+        ) or not path.startswith((
             f'/client{settings.FASTAPI_API_V1_PATH}', 
             f'/admin{settings.FASTAPI_API_V1_PATH}', 
             f'/company{settings.FASTAPI_API_V1_PATH}',
             f'/mentor{settings.FASTAPI_API_V1_PATH}')):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         # request resolution
         try:
@@ -37,59 +96,121 @@ class OperaLogMiddleware(BaseHTTPMiddleware):
         except AttributeError:
             user_email = None
         method = request.method
-        args = await self.get_request_args(request)
-        args = await self.desensitization(args)
 
-        # execute a request
+        # Only small bodies of allowlisted content types are read, others stream through to the application
+        content_type = request.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        body, messages, observer = None, [], None
+        if self.capturable(request, content_type):
+            messages, body = await self.read_body(receive, settings.OPERA_LOG_ARGS_MAX_BODY_SIZE)
+        if body is None:
+            observer = BodyObserver(self.replay_receive(messages, receive), content_type == 'multipart/form-data')
+
+        # execute a request, the body read above is replayed to the application
         start_time = datetime.now()
-        request_next = await self.execute_request(request, call_next)
+        request_next = await self.execute_request(request, observer or self.replay_receive(messages, receive), send)
         end_time = datetime.now()
         cost_time = (end_time - start_time).total_seconds() * 1000.0
 
+        # Path parameters are only known once the request has been routed
+        args = self.get_request_args(request, content_type, body, observer)
+        args = await self.desensitization(args)
+
         # This information can only be obtained after a request
         _route = request.scope.get('route')
         summary = getattr(_route, 'summary', None) or ''
 
-        # Log Creation
-        opera_log_in = CreateOperaLogParam(
+        # Log Creation, client information is resolved in the background task
+        create_task(self.create_log(  # noqa: ignore
+            request.state.client_info,
             trace_id=get_request_trace_id(request),
             user_email=user_email,
             method=method,
             title=summary,
             path=path,
-            ip=request.state.ip,
-            country=request.state.country,
-            region=request.state.region,
-            city=request.state.city,
-            user_agent=request.state.user_agent,
-            os=request.state.os,
-            browser=request.state.browser,
-            device=request.state.device,
             args=args,
             status=request_next.status,
             code=request_next.code,
             msg=request_next.msg,
             cost_time=cost_time,
             opera_time=start_time,
-        )
-        create_task(OperaLogService.create(obj_in=opera_log_in))  # noqa: ignore
+        ))
 
         # error throwing
         err = request_next.err
         if err:
             raise err from None
 
-        return request_next.response
+    @staticmethod
+    async def create_log(client_info: RequestInfo, **kwargs) -> None:
+        """Resolve the client location and user agent, then write the log"""
+        try:
+            location = await client_info.location()
+            opera_log_in = CreateOperaLogParam(
+                ip=client_info.ip,
+                country=location.country,
+                region=location.region,
+                city=location.city,
+                user_agent=client_info.user_agent,
+                os=client_info.os,
+                browser=client_info.browser,
+                device=client_info.device,
+                **kwargs,
+            )
+            await opera_log_writer.put(opera_log_in)
+        except Exception as e:
+            log.error(f'Opera log creation failure: {e}')
+
+    @staticmethod
+    def capturable(request: Request, content_type: str) -> bool:
+        """Whether the request body may be read for the log: allowlisted content type, not known to be too large"""
+        if content_type not in settings.OPERA_LOG_ARGS_CONTENT_TYPES:
+            return False
+        content_length = request.headers.get('Content-Length', '')
+        return not content_length.isdigit() or int(content_length) <= settings.OPERA_LOG_ARGS_MAX_BODY_SIZE
+
+    @staticmethod
+    async def read_body(receive: Receive, limit: int) -> tuple[list[Message], bytes | None]:
+        """
+        Read the request body up to `limit` bytes
 
-    async def execute_request(self, request: Request, call_next) -> RequestCallNext:
+        :param receive:
+        :param limit:
+        :return: The messages read (to be replayed to the application), and the body, None if larger than `limit`
+        """
+        messages, chunks, size = [], [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message['type'] != 'http.request':
+                return messages, None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                return messages, None
+            chunks.append(chunk)
+            if not message.get('more_body', False):
+                return messages, b''.join(chunks)
+
+    @staticmethod
+    def replay_receive(messages: list[Message], receive: Receive) -> Receive:
+        """Receive channel serving the already read messages first, then the client messages"""
+        messages = list(messages)
+
+        async def _receive() -> Message:
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        return _receive
+
+    async def execute_request(self, request: Request, receive: Receive, send: Send) -> RequestCallNext:
         """execute a request"""
         code = 200
         msg = 'Success'
         status = StatusType.enable
         err = None
-        response = None
         try:
-            response = await call_next(request)
+            await self.app(request.scope, receive, send)
             code, msg = self.request_exception_handler(request, code, msg)
         except Exception as e:
             log.error(f'Request Exception: {e}')
@@ -99,7 +220,7 @@ class OperaLogMiddleware(BaseHTTPMiddleware):
             status = StatusType.disable
             err = e
 
-        return RequestCallNext(code=str(code), msg=msg, status=status, err=err, response=response)
+        return RequestCallNext(code=str(code), msg=msg, status=status, err=err, response=None)
 
     @staticmethod
     def request_exception_handler(request: Request, code: int, msg: str) -> tuple[str, str]:
@@ -123,26 +244,29 @@ class OperaLogMiddleware(BaseHTTPMiddleware):
         return code, msg
 
     @staticmethod
-    async def get_request_args(request: Request) -> dict:
-        """Request Exception"""
+    def get_request_args(
+        request: Request, content_type: str, body: bytes | None, observer: 'BodyObserver | None'
+    ) -> dict:
+        """Request parameters, the body is parsed once and only when it was captured"""
         args = dict(request.query_params)
         args.update(request.path_params)
-        # Tip: .body() must be fetched before .form().
-        # https://github.com/encode/starlette/discussions/1933
-        body_data = await request.body()
-        form_data = await request.form()
-        if len(form_data) > 0:
-            args.update({k: v.filename if isinstance(v, UploadFile) else v for k, v in form_data.items()})
-        else:
-            if body_data:
-                json_data = await request.json()
-                if not isinstance(json_data, dict):
-                    json_data = {
-                        f'{type(json_data)}_to_dict_data': json_data.decode('utf-8')
-                        if isinstance(json_data, bytes)
-                        else json_data
-                    }
-                args.update(json_data)
+        if body:
+            try:
+                if content_type == 'application/x-www-form-urlencoded':
+                    args.update(parse_qsl(body.decode('utf-8', 'replace'), keep_blank_values=True))
+                elif content_type.endswith('json'):
+                    json_data = json.loads(body)
+                    if not isinstance(json_data, dict):
+                        json_data = {f'{type(json_data)}_to_dict_data': json_data}
+                    args.update(json_data)
+                else:
+                    args['__body__'] = body.decode('utf-8', 'replace')
+            except ValueError:
+                args['__body_size__'] = len(body)
+        elif observer is not None and observer.size:
+            # Not captured: only metadata, file parts are recorded by field name and file name
+            args.update(observer.parts())
+            args['__body_size__'] = observer.size
         return args
 
     @staticmethod
@@ -3,7 +3,8 @@ from backend.models.role import Role
 from backend.models.user import User
 from backend.models.opera_log import OperaLog
 from backend.models.login_log import LoginLog
-from backend.models.veille import Article
+from backend.models.veille import Article, ArticleBody, LLMCallLog, LLMUsageDaily
+from backend.models.outbox import OutboxMessage
 
 import pkgutil
 import importlib
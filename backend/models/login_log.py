@@ -25,4 +25,23 @@ class LoginLog(DataClassBase):
     device: Mapped[str | None] = mapped_column(sa.String, comment='Device')
     msg: Mapped[str] = mapped_column(sa.TEXT, comment='Message')
     login_time: Mapped[datetime] = mapped_column(comment='Login time')
-    created_time: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), init=False, default=func.now(), comment='Creation time')
+    # Partition key: part of the primary key, the table is range-partitioned by month
+    created_time: Mapped[datetime] = mapped_column(
+        sa.DateTime(timezone=True),
+        primary_key=True,
+        init=False,
+        default=func.now(),
+        server_default=func.now(),
+        comment='Creation time',
+    )
+
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_time)'}
+
+
+# Index of the listing (newest first, optionally filtered by status)
+sa.Index('ix_login_log_created_time', LoginLog.created_time.desc())
+sa.Index('ix_login_log_status_created_time', LoginLog.status, LoginLog.created_time.desc())
+
+# Index of the LIKE '%...%' filters (pg_trgm)
+sa.Index('ix_login_log_ip_trgm', LoginLog.ip, postgresql_using='gin', postgresql_ops={'ip': 'gin_trgm_ops'})
+sa.Index('ix_login_log_email_trgm', LoginLog.email, postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'})
@@ -33,4 +33,23 @@ class OperaLog(DataClassBase):
     msg: Mapped[str] = mapped_column(sa.TEXT, comment='Alert message')
     cost_time: Mapped[float] = mapped_column(insert_default=0.0, comment='Request elapsed time (ms)')
     opera_time: Mapped[datetime] = mapped_column(comment="Operating time")
-    created_time: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), init=False, default=current_timestamp(), comment="Creation time")
\ No newline at end of file
+    # Partition key: part of the primary key, the table is range-partitioned by month
+    created_time: Mapped[datetime] = mapped_column(
+        sa.DateTime(timezone=True),
+        primary_key=True,
+        init=False,
+        default=current_timestamp(),
+        server_default=current_timestamp(),
+        comment="Creation time",
+    )
+
+    __table_args__ = {'postgresql_partition_by': 'RANGE (created_time)'}
+
+
+# Index of the listing (newest first, optionally filtered by status)
+sa.Index('ix_opera_log_created_time', OperaLog.created_time.desc())
+sa.Index('ix_opera_log_status_created_time', OperaLog.status, OperaLog.created_time.desc())
+
+# Index of the LIKE '%...%' filters (pg_trgm)
+sa.Index('ix_opera_log_ip_trgm', OperaLog.ip, postgresql_using='gin', postgresql_ops={'ip': 'gin_trgm_ops'})
+sa.Index('ix_opera_log_user_email_trgm', OperaLog.user_email, postgresql_using='gin', postgresql_ops={'user_email': 'gin_trgm_ops'})
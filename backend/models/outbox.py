@@ -0,0 +1,38 @@
+import sqlalchemy as sa
+
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql.functions import current_timestamp
+
+from backend.common.model import DataClassBase, get_id, id_key
+
+
+class OutboxMessage(DataClassBase):
+    """Transactional outbox: Celery tasks recorded in the transaction of the write that triggers them"""
+
+    __tablename__ = 'outbox_message'
+
+    id: Mapped[id_key] = mapped_column(init=False)
+    task_name: Mapped[str] = mapped_column(sa.String(100), comment='Celery task name')
+    payload: Mapped[dict] = mapped_column(JSONB, comment='Task arguments ({"args": [...], "kwargs": {...}})')
+    dedup_key: Mapped[str] = mapped_column(
+        sa.String(64), unique=True, default_factory=get_id, comment='Delivery key, used as the Celery task id'
+    )
+    attempts: Mapped[int] = mapped_column(sa.Integer, default=0, comment='Relay attempts')
+    last_error: Mapped[str | None] = mapped_column(sa.TEXT, default=None, comment='Last relay error')
+    dispatched_time: Mapped[datetime | None] = mapped_column(
+        sa.DateTime(timezone=True), default=None, comment='Time the task was handed to the broker'
+    )
+    created_time: Mapped[datetime] = mapped_column(
+        sa.DateTime(timezone=True), init=False, default=current_timestamp(), comment='Creation time'
+    )
+
+
+# The relay only ever scans pending messages
+sa.Index(
+    'ix_outbox_message_pending',
+    OutboxMessage.id,
+    postgresql_where=OutboxMessage.dispatched_time.is_(None),
+)
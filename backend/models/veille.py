@@ -1,40 +1,171 @@
 # backend/app/models/veille.py
 
-from sqlalchemy import String, Text, Integer, Boolean, JSON
-from sqlalchemy.orm import Mapped, mapped_column
-from typing import Optional
+from datetime import date, datetime
 
-from ..common.model import Base, id_key
+from sqlalchemy import DDL, BigInteger, Date, String, Text, Integer, Boolean, DateTime, ForeignKey, Index, event
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql.functions import current_timestamp
+from typing import Any, Optional
+
+from ..common.model import Base, DataClassBase, id_key
+
+# Champs de `analysis` indexés par la recherche plein texte
+SEARCH_ANALYSIS_FIELDS = ('resume_neutre', 'problematique_generale', 'impact_afrique', 'piste_opportunite')
+
+
+def search_vector_expression(config: str) -> str:
+    """
+    Expression du `tsvector` d'un article pour une configuration de recherche Postgres,
+    évaluée sur la jointure `article` / `article_body`.
+    Poids : A = titre, B = champs clés de l'analyse, C = contenu.
+    """
+    analysis_text = " || ' ' || ".join(f"coalesce(article.analysis ->> '{field}', '')" for field in SEARCH_ANALYSIS_FIELDS)
+    return (
+        f"setweight(to_tsvector('{config}', coalesce(article.title, '')), 'A') || "
+        f"setweight(to_tsvector('{config}', {analysis_text}), 'B') || "
+        f"setweight(to_tsvector('{config}', coalesce(article_body.content, '')), 'C')"
+    )
 
 class Article(Base):
     """
     Modèle SQLAlchemy pour stocker les articles de veille analysés.
+    Ligne "chaude" lue par toutes les listes : le contenu complet vit dans `ArticleBody`.
     """
     id: Mapped[id_key] = mapped_column(init=False)
 
     # --- Champs avec la taille des colonnes corrigée ---
 
     url: Mapped[str] = mapped_column(String(1024), unique=True, index=True, nullable=False, default=None)
-    
+
     # Un titre peut parfois être long, le passer en TEXT est plus sûr.
     title: Mapped[str] = mapped_column(Text, nullable=False, default=None)
-    
+
     source: Mapped[str] = mapped_column(String(100), nullable=False, default=None)
-    
+
     published: Mapped[bool] = mapped_column(Boolean, default=False)
-    
+
+    # Date brute renvoyée par l'extraction ("N/A" ou chaîne libre), conservée telle quelle.
     date: Mapped[Optional[str]] = mapped_column(String(50), default=None)
-    
-    # Le contenu est déjà en TEXT, c'est parfait.
-    content: Mapped[Optional[str]] = mapped_column(Text, default=None)
-    
+
+    # Date de publication normalisée à l'ingestion : sert aux filtres temporels et au tri "récents".
+    published_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), default=None)
+
     score_pertinence: Mapped[Optional[int]] = mapped_column(Integer, index=True, default=None)
-    
-    # analysis (JSON) et error (TEXT) sont les plus importants à corriger.
-    analysis: Mapped[Optional[dict]] = mapped_column(JSON, default=None)
-    
+
+    # analysis en JSONB : les filtres sur ses champs sont exécutés et indexés côté Postgres.
+    analysis: Mapped[Optional[dict]] = mapped_column(JSONB, default=None)
+
+    # Version du prompt qui a produit `analysis` (voir `veille_service.ANALYSIS_PROMPTS`).
+    analysis_version: Mapped[Optional[str]] = mapped_column(String(20), default=None)
+
     # Les messages d'erreur peuvent être très longs, TEXT est obligatoire ici.
     error: Mapped[Optional[str]] = mapped_column(Text, default=None)
 
+    # Coût du dernier appel LLM d'analyse (tokens, latence, tentatives, résultat).
+    llm_usage: Mapped[Optional[dict]] = mapped_column(JSONB, default=None, repr=False)
+
+    # Corps de l'article : jamais chargé implicitement (lazy="raise"), uniquement par la vue détail.
+    body: Mapped[Optional["ArticleBody"]] = relationship(
+        init=False, default=None, repr=False, compare=False, lazy="raise", uselist=False, cascade="all, delete-orphan"
+    )
+
+    @property
+    def content(self) -> Optional[str]:
+        """Contenu complet ; nécessite que `body` ait été chargé (`selectinload(Article.body)`)."""
+        return self.body.content if self.body else None
+
     def __repr__(self) -> str:
-        return f"<Article(id={self.id}, title='{self.title[:30]}...')>"
\ No newline at end of file
+        return f"<Article(id={self.id}, title='{self.title[:30]}...')>"
+
+
+class ArticleBody(DataClassBase):
+    """
+    Contenu complet d'un article et ses vecteurs de recherche, hors de la ligne `article`.
+
+    Le texte reste en clair pour la recherche plein texte et `ts_headline` ; il est compressé
+    par TOAST (lz4) au-delà de ~2 Ko. Les vecteurs sont recalculés à chaque écriture de l'article
+    (voir `crud_veille.refresh_search_vectors`).
+    """
+    __tablename__ = 'article_body'
+
+    article_id: Mapped[int] = mapped_column(ForeignKey('article.id', ondelete='CASCADE'), primary_key=True, init=False)
+
+    content: Mapped[Optional[str]] = mapped_column(Text, default=None)
+
+    # Vecteurs de recherche plein texte (jamais chargés par l'ORM), NULL jusqu'au calcul qui suit l'insertion
+    search_vector_fr: Mapped[Optional[Any]] = mapped_column(TSVECTOR, init=False, default=None, repr=False, compare=False, deferred=True)
+    search_vector_en: Mapped[Optional[Any]] = mapped_column(TSVECTOR, init=False, default=None, repr=False, compare=False, deferred=True)
+
+
+class LLMCallLog(DataClassBase):
+    """Journal des appels LLM d'analyse : une ligne par appel, agrégée chaque jour dans `LLMUsageDaily`."""
+    __tablename__ = 'llm_call_log'
+
+    id: Mapped[id_key] = mapped_column(init=False)
+    article_url: Mapped[str] = mapped_column(String(1024))
+    source: Mapped[Optional[str]] = mapped_column(String(100))
+    model: Mapped[str] = mapped_column(String(50))
+    prompt_version: Mapped[str] = mapped_column(String(20))
+    # Taille du contenu envoyé au LLM (caractères, après troncature)
+    content_length: Mapped[int] = mapped_column(Integer)
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    latency_ms: Mapped[int] = mapped_column(Integer, default=0)
+    retries: Mapped[int] = mapped_column(Integer, default=0)
+    # success | parse_error | error
+    outcome: Mapped[str] = mapped_column(String(20), default='success')
+    created_time: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), init=False, default=current_timestamp(), index=True
+    )
+
+
+class LLMUsageDaily(DataClassBase):
+    """Agrégats quotidiens des appels LLM par source, modèle, version de prompt et tranche de taille de contenu."""
+    __tablename__ = 'llm_usage_daily'
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    source: Mapped[str] = mapped_column(String(100), primary_key=True)
+    model: Mapped[str] = mapped_column(String(50), primary_key=True)
+    prompt_version: Mapped[str] = mapped_column(String(20), primary_key=True)
+    # Borne basse de la tranche de taille de contenu (caractères)
+    length_bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    calls: Mapped[int] = mapped_column(Integer, default=0)
+    failures: Mapped[int] = mapped_column(Integer, default=0)
+    retries: Mapped[int] = mapped_column(Integer, default=0)
+    prompt_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    completion_tokens: Mapped[int] = mapped_column(BigInteger, default=0)
+    latency_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+
+
+# Compression TOAST lz4 (Postgres >= 14) : plus rapide que pglz à taux comparable sur du texte
+event.listen(
+    ArticleBody.__table__,
+    'after_create',
+    DDL('ALTER TABLE article_body ALTER COLUMN content SET COMPRESSION lz4').execute_if(dialect='postgresql'),
+)
+
+
+# Index de la pagination par curseur de la liste des articles
+Index('ix_article_score_pertinence_id', Article.score_pertinence.desc().nulls_last(), Article.id.desc())
+
+# Index des fenêtres temporelles ("nouveautés de la semaine", publiés ou triés par pertinence)
+Index('ix_article_published_published_at', Article.published, Article.published_at)
+Index('ix_article_score_pertinence_published_at', Article.score_pertinence, Article.published_at)
+Index('ix_article_published_at_id', Article.published_at.desc().nulls_last(), Article.id.desc())
+
+# Index de la ré-analyse : articles d'une autre version de prompt, parcourus par ID
+Index('ix_article_analysis_version_id', Article.analysis_version, Article.id)
+
+# Index GIN de la recherche plein texte
+Index('ix_article_body_search_vector_fr', ArticleBody.search_vector_fr, postgresql_using='gin')
+Index('ix_article_body_search_vector_en', ArticleBody.search_vector_en, postgresql_using='gin')
+
+# Index des filtres sur `analysis` : containment (`@>`) et recherche de texte sur `impact_afrique` (pg_trgm)
+Index('ix_article_analysis', Article.analysis, postgresql_using='gin', postgresql_ops={'analysis': 'jsonb_path_ops'})
+Index(
+    'ix_article_impact_afrique_trgm',
+    Article.analysis['impact_afrique'].astext.label('impact_afrique'),
+    postgresql_using='gin',
+    postgresql_ops={'impact_afrique': 'gin_trgm_ops'},
+)
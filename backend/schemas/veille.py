@@ -15,6 +15,11 @@ class ArticleAnalysisPydantic(BaseModel):
     piste_opportunite: str = Field(description="Une idée d'opportunité concrète pour l'écosystème tech africain.")
     score_pertinence: int = Field(description="Un score de 1 à 10 sur l'importance pour l'Afrique.", ge=1, le=10)
 
+# Sortie de l'analyse groupée : chaque élément est validé séparément contre
+# `ArticleAnalysisPydantic`, pour qu'un élément invalide n'invalide pas tout le lot.
+class ArticleAnalysisBatchPydantic(BaseModel):
+    analyses: List[Dict[str, Any]]
+
 # --- Schémas pour les Endpoints de l'API ---
 
 # Schéma de base partagé par la création et la lecture
@@ -29,8 +34,10 @@ class ArticleResponse(ArticleBase):
     id: int # L'ID est un entier car on utilise id_key
     published: bool
     date: Optional[str] = None
+    published_at: Optional[datetime] = None
     score_pertinence: Optional[int] = None
     analysis: Optional[Dict[str, Any]] = None
+    analysis_version: Optional[str] = None
     error: Optional[str] = None
     created_time: datetime
     updated_time: Optional[datetime] = None
@@ -39,7 +46,23 @@ class ArticleResponse(ArticleBase):
     class Config:
         from_attributes = True
 
+# Schéma du détail d'un article : inclut le contenu complet,
+# absent des listes pour garder des réponses légères.
+class ArticleDetailResponse(ArticleResponse):
+    content: Optional[str] = None
+
 # Schéma pour la mise à jour du statut de publication
 # C'est ce que l'admin envoie dans le corps de la requête POST.
 class PublishStatusUpdate(BaseModel):
-    published: bool
\ No newline at end of file
+    published: bool
+
+# Schéma de la publication groupée (ex. composition d'un digest)
+class BulkPublishStatusUpdate(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=500, description="IDs des articles à modifier")
+    published: bool
+
+# Résultat de la publication groupée
+class BulkPublishStatusResponse(BaseModel):
+    published: bool
+    updated_ids: List[int] = Field(description="Articles dont le statut a changé")
+    unchanged_ids: List[int] = Field(description="Articles déjà dans l'état demandé ou introuvables")
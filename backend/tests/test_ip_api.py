@@ -0,0 +1,202 @@
+"""
+Online ip lookups against a local stand-in for ip-api.com
+
+The stub server answers `/json/{ip}` and `/batch` like ip-api does, can delay its answers, fail given ips
+and advertise a rate limit, and records every request it receives. Redis is replaced by an in-memory
+store so that the cache written by `get_ip_info` can be inspected.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from backend.core.conf import settings
+from backend.utils import request_parse
+from backend.utils.ip_api import IpApiClient
+
+
+class StubIpApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'StubIpApiServer'
+
+    def do_GET(self):
+        ip = self.path.split('?')[0].removeprefix('/json/')
+        self.server.record(('GET', [ip]))
+        self._reply(self.server.document(ip))
+
+    def do_POST(self):
+        ips = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.record(('POST', ips))
+        self._reply([self.server.document(ip) for ip in ips])
+
+    def _reply(self, body):
+        time.sleep(self.server.delay)
+        status, headers = self.server.status, dict(self.server.headers)
+        content = json.dumps(body if status == 200 else {'message': 'too many requests'}).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubIpApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubIpApiHandler)
+        self.delay = 0.0
+        self.status = 200
+        self.headers: dict[str, str] = {}
+        self.failing: set[str] = set()
+        self.requests: list[tuple[str, list[str]]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address
+        return f'http://{host}:{port}'
+
+    def record(self, request: tuple[str, list[str]]) -> None:
+        with self._lock:
+            self.requests.append(request)
+
+    def document(self, ip: str) -> dict:
+        if ip in self.failing:
+            return {'status': 'fail', 'message': 'private range', 'query': ip}
+        return {'status': 'success', 'country': 'France', 'regionName': 'Île-de-France', 'city': 'Paris', 'query': ip}
+
+
+class FakeRedis:
+    def __init__(self):
+        self.store: dict[str, tuple[str, int | None]] = {}
+
+    async def get(self, key: str) -> str | None:
+        entry = self.store.get(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: str, ex: int | None = None) -> None:
+        self.store[key] = (value, ex)
+
+
+class IpApiTestCase(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = StubIpApiServer()
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.clients: list[IpApiClient] = []
+
+    async def asyncTearDown(self):
+        for client in self.clients:
+            await client.close()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def make_client(self, batch: bool = False, batch_wait: float = 0.1) -> IpApiClient:
+        client = IpApiClient(self.server.url, timeout=3, batch=batch, batch_wait=batch_wait)
+        self.clients.append(client)
+        return client
+
+
+class GetIpInfoTest(IpApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeRedis()
+        for patcher in (
+            mock.patch.object(request_parse, 'ip_api_client', self.make_client()),
+            mock.patch.object(request_parse, 'redis_client', self.redis),
+            mock.patch.object(settings, 'IP_LOCATION_PARSE', 'online'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_concurrent_lookups_are_coalesced(self):
+        self.server.delay = 0.2
+        infos = await asyncio.gather(*(request_parse.get_ip_info('203.0.113.1', None) for _ in range(10)))
+        self.assertEqual(self.server.requests, [('GET', ['203.0.113.1'])])
+        self.assertTrue(all(info == infos[0] for info in infos))
+        self.assertEqual((infos[0].country, infos[0].region, infos[0].city), ('France', 'Île-de-France', 'Paris'))
+
+    async def test_failed_lookup_is_cached_briefly(self):
+        self.server.failing.add('203.0.113.2')
+        first = await request_parse.get_ip_info('203.0.113.2', None)
+        second = await request_parse.get_ip_info('203.0.113.2', None)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertIsNone(first.country)
+        self.assertEqual(first, second)
+        _, ex = self.redis.store[f'{settings.IP_LOCATION_REDIS_PREFIX}:203.0.113.2']
+        self.assertEqual(ex, settings.IP_LOCATION_NEGATIVE_EXPIRE_SECONDS)
+
+    async def test_successful_lookup_is_cached(self):
+        await request_parse.get_ip_info('203.0.113.3', None)
+        _, ex = self.redis.store[f'{settings.IP_LOCATION_REDIS_PREFIX}:203.0.113.3']
+        self.assertEqual(ex, settings.IP_LOCATION_EXPIRE_SECONDS)
+
+
+class RateLimitTest(IpApiTestCase):
+    async def test_429_pauses_lookups(self):
+        client = self.make_client()
+        self.server.status = 429
+        self.server.headers = {'X-Ttl': '30'}
+        self.assertIsNone(await client.lookup('203.0.113.4'))
+        self.server.status = 200
+        self.assertIsNone(await client.lookup('203.0.113.4'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    async def test_exhausted_quota_pauses_lookups(self):
+        client = self.make_client()
+        self.server.headers = {'X-Rl': '0', 'X-Ttl': '30'}
+        self.assertEqual((await client.lookup('203.0.113.5'))['city'], 'Paris')
+        self.assertIsNone(await client.lookup('203.0.113.6'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    async def test_lookups_resume_after_ttl(self):
+        client = self.make_client()
+        self.server.headers = {'X-Rl': '0', 'X-Ttl': '0'}
+        await client.lookup('203.0.113.7')
+        self.server.headers = {'X-Rl': '44', 'X-Ttl': '60'}
+        self.assertEqual((await client.lookup('203.0.113.7'))['city'], 'Paris')
+        self.assertEqual(len(self.server.requests), 2)
+
+
+class BatchTest(IpApiTestCase):
+    async def test_queued_lookups_share_one_batch(self):
+        client = self.make_client(batch=True)
+        self.server.failing.add('203.0.113.9')
+        ips = ['203.0.113.8', '203.0.113.9', '203.0.113.8', '203.0.113.10']
+        results = await asyncio.gather(*(client.lookup(ip) for ip in ips))
+        self.assertEqual(self.server.requests, [('POST', ['203.0.113.8', '203.0.113.9', '203.0.113.10'])])
+        self.assertEqual([result and result['query'] for result in results], ['203.0.113.8', None, '203.0.113.8', '203.0.113.10'])
+
+    async def test_rate_limited_batch_fails_lookups(self):
+        client = self.make_client(batch=True)
+        self.server.status = 429
+        self.server.headers = {'X-Ttl': '30'}
+        self.assertEqual(await asyncio.gather(client.lookup('203.0.113.11'), client.lookup('203.0.113.12')), [None, None])
+        self.assertIsNone(await client.lookup('203.0.113.13'))
+        self.assertEqual(len(self.server.requests), 1)
+
+    async def test_close_fails_waiting_lookups(self):
+        client = self.make_client(batch=True, batch_wait=5)
+        lookup = asyncio.create_task(client.lookup('203.0.113.14'))
+        await asyncio.sleep(0.1)
+        await client.close()
+        self.assertIsNone(await lookup)
+        self.assertEqual(self.server.requests, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import hashlib
+
+from typing import Any
+
+from fastapi import Request, Response
+
+from backend.common.log import log
+from backend.utils.response_cache import GenerationCounter
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from cheap version markers (cache generation, max updated time, request parameters...)
+
+    The response body is never hashed: the tag must be computable before the response is rendered.
+
+    :param parts:
+    :return:
+    """
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+async def generation_etag(request: Request, counter: GenerationCounter) -> str | None:
+    """
+    ETag of a GET request over a data set versioned by a generation counter, None if Redis is unavailable
+
+    :param request:
+    :param counter:
+    :return:
+    """
+    try:
+        generation = await counter.get()
+    except Exception as e:
+        log.error(f'ETag generation failure ({counter.key}): {e}')
+        return None
+    return make_etag(counter.key, generation, request.url.path, sorted(request.query_params.multi_items()))
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match header matches the ETag (weak comparison)
+
+    :param request:
+    :param etag:
+    :return:
+    """
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+def etag_headers(etag: str) -> dict[str, str]:
+    """
+    Response headers for a revalidatable response
+
+    :param etag:
+    :return:
+    """
+    return {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+
+def not_modified(etag: str) -> Response:
+    """
+    Empty 304 response, nothing is rendered
+
+    :param etag:
+    :return:
+    """
+    return Response(status_code=304, headers=etag_headers(etag))
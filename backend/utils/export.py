@@ -0,0 +1,101 @@
+import csv
+import io
+
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterable
+
+from msgspec import json
+from sqlalchemy import Select
+from starlette.responses import StreamingResponse
+
+from backend.common.enums import ExportFormatType
+from backend.common.exception import errors
+from backend.core.conf import settings
+from backend.database.db_postgres import async_db_session
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormatType.ndjson: 'application/x-ndjson',
+    ExportFormatType.csv: 'text/csv; charset=utf-8',
+}
+
+
+async def stream_select(stmt: Select, chunk_size: int = settings.EXPORT_CHUNK_SIZE) -> AsyncIterator[list[dict]]:
+    """
+    Read a select through a server-side cursor, one chunk of rows at a time
+
+    The session is owned by the generator: it stays open for the whole response body,
+    after the request dependencies have been closed.
+
+    :param stmt: Column select (rows are returned as dicts)
+    :param chunk_size: Rows per cursor round trip
+    :return:
+    """
+    async with async_db_session() as db:
+        result = await db.stream(stmt.execution_options(yield_per=chunk_size))
+        async for partition in result.mappings().partitions():
+            yield [dict(row) for row in partition]
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.encode(value).decode()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def _ndjson_chunks(chunks: AsyncIterator[list[dict]]) -> AsyncIterator[bytes]:
+    encoder = json.Encoder(decimal_format='number')
+    async for rows in chunks:
+        yield encoder.encode_lines(rows)
+
+
+async def _csv_chunks(chunks: AsyncIterator[list[dict]], columns: list[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for rows in chunks:
+        writer.writerows([_csv_value(row[column]) for column in columns] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def export_response(stmt: Select, export_format: ExportFormatType, filename: str) -> StreamingResponse:
+    """
+    Stream a select as NDJSON or CSV in constant memory
+
+    :param stmt: Column select to export
+    :param export_format:
+    :param filename: File name without extension
+    :return:
+    """
+    chunks = stream_select(stmt)
+    match export_format:
+        case ExportFormatType.ndjson:
+            body = _ndjson_chunks(chunks)
+        case ExportFormatType.csv:
+            body = _csv_chunks(chunks, [column.key for column in stmt.selected_columns])
+        case _:
+            raise errors.RequestError(msg=f'Unsupported export format: {export_format}')
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{export_format.value}"'},
+    )
+
+
+def table_columns(stmt: Select, exclude: Iterable[str] = ()) -> Select:
+    """
+    Turn an entity select into a select of its table columns, keeping filters and ordering
+
+    :param stmt:
+    :param exclude: Column names to leave out
+    :return:
+    """
+    table = stmt.column_descriptions[0]['entity'].__table__
+    return stmt.with_only_columns(*(column for column in table.columns if column.key not in exclude))
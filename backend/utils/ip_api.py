@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import httpx
+
+from backend.common.log import log
+from backend.core.conf import settings
+
+# Fields requested from ip-api, `query` echoes the ip so batch results can be matched
+IP_API_FIELDS = 'status,message,country,regionName,city,query'
+# Maximum number of ips per ip-api batch request
+IP_API_BATCH_SIZE = 100
+
+
+class IpApiClient:
+    """
+    ip-api.com client shared by the whole process
+
+    Requests go through one pooled `httpx.AsyncClient` (kept-alive connections, no handshake per lookup).
+    The rate limit advertised by ip-api (`X-Rl` / `X-Ttl` headers, HTTP 429) is honoured: once exhausted,
+    lookups fail fast until the window resets instead of piling up refused requests. In batch mode,
+    lookups are queued and resolved together through the batch endpoint by a background worker.
+    """
+
+    def __init__(self, base_url: str, timeout: float, batch: bool, batch_wait: float):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.batch = batch
+        self.batch_wait = batch_wait
+        self._client: httpx.AsyncClient | None = None
+        self._blocked_until = 0.0
+        self._queue: asyncio.Queue[tuple[str, asyncio.Future]] | None = None
+        self._worker: asyncio.Task | None = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            )
+        return self._client
+
+    def _rate_limited(self) -> bool:
+        return time.monotonic() < self._blocked_until
+
+    def _update_rate_limit(self, response: httpx.Response) -> None:
+        if response.status_code == 429 or response.headers.get('X-Rl') == '0':
+            ttl = response.headers.get('X-Ttl', '')
+            self._blocked_until = time.monotonic() + (int(ttl) if ttl.isdigit() else 60)
+            log.warning(f'ip-api rate limit reached, online lookups paused for {ttl or 60}s')
+
+    async def lookup(self, ip: str, user_agent: str | None = None) -> dict | None:
+        """
+        Location of an ip address, None if the lookup failed or was rate limited
+
+        :param ip:
+        :param user_agent: Forwarded to ip-api (single lookups only)
+        :return: ip-api document (`country`, `regionName`, `city`)
+        """
+        if self._rate_limited():
+            return None
+        if self.batch:
+            return await self._lookup_batched(ip)
+        headers = {'User-Agent': user_agent} if user_agent else None
+        try:
+            response = await self.client.get(
+                f'/json/{ip}', params={'lang': 'fr-FR', 'fields': IP_API_FIELDS}, headers=headers
+            )
+        except Exception as e:
+            log.error(f'Failed to obtain ip address attributes online, error message:{e}')
+            return None
+        self._update_rate_limit(response)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        return data if data.get('status') == 'success' else None
+
+    async def _lookup_batched(self, ip: str) -> dict | None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._batch_worker())
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((ip, future))
+        return await future
+
+    async def _batch_worker(self) -> None:
+        while True:
+            pending = [await self._queue.get()]
+            results = {}
+            try:
+                deadline = time.monotonic() + self.batch_wait
+                while len(pending) < IP_API_BATCH_SIZE:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                results = await self._post_batch(list(dict.fromkeys(ip for ip, _ in pending)))
+            except Exception as e:
+                log.error(f'Failed to obtain ip address attributes online, error message:{e}')
+            finally:
+                # Also reached on cancellation: no lookup is left waiting forever
+                for ip, future in pending:
+                    if not future.done():
+                        future.set_result(results.get(ip))
+
+    async def _post_batch(self, ips: list[str]) -> dict[str, dict]:
+        if self._rate_limited():
+            return {}
+        response = await self.client.post('/batch', params={'lang': 'fr-FR', 'fields': IP_API_FIELDS}, json=ips)
+        self._update_rate_limit(response)
+        if response.status_code != 200:
+            return {}
+        return {item['query']: item for item in response.json() if item.get('status') == 'success'}
+
+    async def close(self) -> None:
+        """
+        Stop the batch worker, failing queued lookups, and close the pooled connections
+
+        :return:
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                _, future = self._queue.get_nowait()
+                if not future.done():
+                    future.set_result(None)
+            self._queue = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+ip_api_client = IpApiClient(
+    settings.IP_LOCATION_ONLINE_URL,
+    settings.IP_LOCATION_ONLINE_TIMEOUT,
+    settings.IP_LOCATION_ONLINE_BATCH,
+    settings.IP_LOCATION_ONLINE_BATCH_WAIT_SECONDS,
+)
@@ -0,0 +1,68 @@
+import re
+
+_CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$', re.IGNORECASE)
+
+
+def _balance(text: str) -> str:
+    """Cut the text after the top-level value, or close what a truncated document left open"""
+    closers = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            closers.append('}' if char == '{' else ']')
+        elif char in '}]' and closers:
+            closers.pop()
+            if not closers:
+                return text[:index + 1]
+    if in_string:
+        text += '"'
+    return text + ''.join(reversed(closers))
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Drop the commas directly followed by a closing bracket, outside strings only"""
+    chars = []
+    comma = None  # index in `chars` of a comma followed only by whitespace so far
+    in_string = escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        else:
+            if char in '}]' and comma is not None:
+                del chars[comma]
+            if not char.isspace():
+                comma = len(chars) if char == ',' else None
+            in_string = char == '"'
+        chars.append(char)
+    return ''.join(chars)
+
+
+def repair_json(text: str) -> str:
+    """
+    Fix the defects LLMs commonly add around a JSON object, without calling the model again
+
+    Markdown code fences and surrounding prose are dropped, trailing commas removed and a truncated
+    document is closed. The result is not guaranteed to be valid: it must still be validated.
+
+    :param text: Raw completion
+    :return:
+    """
+    text = _CODE_FENCE.sub('', text.strip())
+    start = text.find('{')
+    if start == -1:
+        return text
+    return _strip_trailing_commas(_balance(text[start:]))
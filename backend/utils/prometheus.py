@@ -14,13 +14,11 @@ from opentelemetry.sdk.trace.export import BatchSpanProcessor
 from prometheus_client import REGISTRY, Counter, Gauge, Histogram
 from prometheus_client.openmetrics.exposition import (CONTENT_TYPE_LATEST,
                                                       generate_latest)
-from starlette.middleware.base import (BaseHTTPMiddleware,
-                                       RequestResponseEndpoint)
 from starlette.requests import Request
 from starlette.responses import Response
 from starlette.routing import Match
 from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 INFO = Gauge(
     "fastapi_app_info", "FastAPI application information.", [
@@ -51,33 +49,103 @@ REQUESTS_IN_PROGRESS = Gauge(
     ["method", "path", "app_name"],
 )
 
+USER_AGENT_PARSE_CACHE = Counter(
+    "user_agent_parse_cache_total",
+    "Total count of user agent parsing cache lookups by result (hit, miss).",
+    ["result"],
+)
+OPERA_LOG_QUEUE_DEPTH = Gauge(
+    "opera_log_queue_depth",
+    "Gauge of operation logs waiting to be written.",
+)
+OPERA_LOG_WRITTEN = Counter(
+    "opera_log_written_total",
+    "Total count of operation logs written.",
+)
+OPERA_LOG_DROPPED = Counter(
+    "opera_log_dropped_total",
+    "Total count of operation logs dropped by reason (queue_full, write_error, shutdown).",
+    ["reason"],
+)
+OPERA_LOG_BATCH_SIZE = Histogram(
+    "opera_log_batch_size",
+    "Histogram of operation logs per bulk insert.",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+OPERA_LOG_FLUSH_DURATION = Histogram(
+    "opera_log_flush_duration_seconds",
+    "Histogram of operation log bulk insert duration (in seconds).",
+)
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "Total count of LLM analysis calls by model, prompt version and outcome.",
+    ["model", "prompt_version", "outcome"],
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total",
+    "Total count of LLM analysis retries by model and prompt version.",
+    ["model", "prompt_version"],
+)
+LLM_JSON_REPAIRS = Counter(
+    "llm_json_repairs_total",
+    "Total count of LLM JSON completions repaired locally instead of re-prompting.",
+    ["model", "prompt_version"],
+)
+LLM_TOKENS = Histogram(
+    "llm_tokens",
+    "Histogram of tokens per LLM analysis call by model, prompt version and kind (prompt, completion).",
+    ["model", "prompt_version", "kind"],
+    buckets=(100, 250, 500, 1000, 2000, 4000, 8000, 16000),
+)
+LLM_LATENCY = Histogram(
+    "llm_call_duration_seconds",
+    "Histogram of LLM analysis call duration, retries included (in seconds).",
+    ["model", "prompt_version", "outcome"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 40, 80, 160),
+)
+
+
+class PrometheusMiddleware:
+    """Request metrics middleware (pure ASGI: no extra task or body buffering per request)"""
 
-class PrometheusMiddleware(BaseHTTPMiddleware):
     def __init__(self, app: ASGIApp, app_name: str = "fastapi-app") -> None:
-        super().__init__(app)
+        self.app = app
         self.app_name = app_name
         INFO.labels(app_name=self.app_name).inc()
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
         method = request.method
         path, is_handled_path = self.get_path(request)
 
         if not is_handled_path:
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
+
+        status_code = HTTP_500_INTERNAL_SERVER_ERROR
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
 
         REQUESTS_IN_PROGRESS.labels(
             method=method, path=path, app_name=self.app_name).inc()
         REQUESTS.labels(method=method, path=path, app_name=self.app_name).inc()
         before_time = time.perf_counter()
         try:
-            response = await call_next(request)
+            await self.app(scope, receive, send_wrapper)
         except BaseException as e:
             status_code = HTTP_500_INTERNAL_SERVER_ERROR
             EXCEPTIONS.labels(method=method, path=path, exception_type=type(
                 e).__name__, app_name=self.app_name).inc()
             raise e from None
         else:
-            status_code = response.status_code
             after_time = time.perf_counter()
             # retrieve trace id for exemplar
             span = trace.get_current_span()
@@ -93,8 +161,6 @@ class PrometheusMiddleware(BaseHTTPMiddleware):
             REQUESTS_IN_PROGRESS.labels(
                 method=method, path=path, app_name=self.app_name).dec()
 
-        return response
-
     @staticmethod
     def get_path(request: Request) -> Tuple[str, bool]:
         for route in request.app.routes:
@@ -1,7 +1,9 @@
-import httpx
-import json 
+import asyncio
+import json
+import mmap
+
+from functools import cached_property, lru_cache
 
-from asgiref.sync import sync_to_async
 from fastapi import Request
 from user_agents import parse
 from XdbSearchIP.xdbSearcher import XdbSearcher
@@ -11,6 +13,11 @@ from backend.common.log import log
 from backend.core.conf import settings
 from backend.core.path_conf import IP2REGION_XDB
 from backend.database.db_redis import redis_client
+from backend.utils.ip_api import ip_api_client
+from backend.utils.prometheus import USER_AGENT_PARSE_CACHE
+from backend.utils.singleflight import SingleFlight
+
+_ip_info_singleflight: SingleFlight[IpInfo] = SingleFlight()
 
 
 def get_request_ip(request: Request) -> str:
@@ -37,45 +44,70 @@ async def get_location_online(ip: str, user_agent: str) -> dict | None:
     :param user_agent:
     :return:
     """
-    async with httpx.AsyncClient(timeout=3) as client:
-        ip_api_url = f'http://ip-api.com/json/{ip}?lang=fr-FR'
-        headers = {'User-Agent': user_agent}
-        try:
-            response = await client.get(ip_api_url, headers=headers)
-            if response.status_code == 200:
-                return response.json()
-        except Exception as e:
-            log.error(f'Failed to obtain ip address attributes online, error message:{e}')
-            return None
-
-
-@sync_to_async
-def get_location_offline(ip: str) -> dict | None:
+    return await ip_api_client.lookup(ip, user_agent)
+
+
+@lru_cache(maxsize=1)
+def _xdb_searcher() -> XdbSearcher:
+    """
+    Searcher over the ip2region database, memory-mapped once per process
+
+    Lookups read the mapped pages in place: no file read per lookup, and the pages are shared
+    through the OS page cache by every worker process.
+    """
+    with open(IP2REGION_XDB, 'rb') as f:
+        content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return XdbSearcher(contentBuff=content)
+
+
+@lru_cache(maxsize=settings.IP_LOCATION_OFFLINE_CACHE_SIZE)
+def _search_offline(ip: str) -> tuple[str | None, str | None, str | None]:
+    data = _xdb_searcher().search(ip).split('|')
+    return (
+        data[0] if data[0] != '0' else None,
+        data[2] if data[2] != '0' else None,
+        data[3] if data[3] != '0' else None,
+    )
+
+
+async def get_location_offline(ip: str) -> dict | None:
     """
     Get ip address generically offline, can't guarantee accuracy, 100% available
 
+    A lookup is a binary search over the memory-mapped database (microseconds), hot ips are served
+    from an in-process LRU: it runs inline, a thread hop would cost more than the search.
+
     :param ip:
     :return:
     """
     try:
-        cb = XdbSearcher.loadContentFromFile(dbfile=IP2REGION_XDB)
-        searcher = XdbSearcher(contentBuff=cb)
-        data = searcher.search(ip)
-        searcher.close()
-        data = data.split('|')
+        country, region, city = _search_offline(ip)
         return {
-            'country': data[0] if data[0] != '0' else None,
-            'regionName': data[2] if data[2] != '0' else None,
-            'city': data[3] if data[3] != '0' else None,
+            'country': country,
+            'regionName': region,
+            'city': city,
         }
     except Exception as e:
         log.error(f'Failed to obtain ip address generics offline, error message:{e}')
         return None
 
 
-async def parse_ip_info(request: Request) -> IpInfo:
+async def get_ip_info(ip: str, user_agent: str | None) -> IpInfo:
+    """
+    Resolve the location of an ip address, cached in redis
+
+    Concurrent lookups of the same ip share one resolution; failed lookups are cached for a short time
+    so that an unavailable or rate limited provider is not queried again for every request.
+
+    :param ip:
+    :param user_agent: Forwarded to the online lookup
+    :return:
+    """
+    return await _ip_info_singleflight.do(ip, lambda: _resolve_ip_info(ip, user_agent))
+
+
+async def _resolve_ip_info(ip: str, user_agent: str | None) -> IpInfo:
     country, region, city = None, None, None
-    ip = get_request_ip(request)
     location = await redis_client.get(f'{settings.IP_LOCATION_REDIS_PREFIX}:{ip}')
     if location:
         location = json.loads(location)
@@ -84,27 +116,90 @@ async def parse_ip_info(request: Request) -> IpInfo:
         city = location.get("city")
         return IpInfo(ip=ip, country=country, region=region, city=city)
     if settings.IP_LOCATION_PARSE == 'online':
-        location_info = await get_location_online(ip, request.headers.get('User-Agent'))
+        location_info = await get_location_online(ip, user_agent)
     elif settings.IP_LOCATION_PARSE == 'offline':
         location_info = await get_location_offline(ip)
     else:
-        location_info = None
+        return IpInfo(ip=ip, country=country, region=region, city=city)
     if location_info:
         country = location_info.get('country')
         region = location_info.get('regionName')
         city = location_info.get('city')
-        await redis_client.set(
-            f'{settings.IP_LOCATION_REDIS_PREFIX}:{ip}',
-            json.dumps({"country": country, "region": region, "city": city}),
-            ex=settings.IP_LOCATION_EXPIRE_SECONDS,
-        )
+        expire_seconds = settings.IP_LOCATION_EXPIRE_SECONDS
+    else:
+        expire_seconds = settings.IP_LOCATION_NEGATIVE_EXPIRE_SECONDS
+    await redis_client.set(
+        f'{settings.IP_LOCATION_REDIS_PREFIX}:{ip}',
+        json.dumps({"country": country, "region": region, "city": city}),
+        ex=expire_seconds,
+    )
     return IpInfo(ip=ip, country=country, region=region, city=city)
 
 
-def parse_user_agent_info(request: Request) -> UserAgentInfo:
-    user_agent = request.headers.get('User-Agent')
+async def parse_ip_info(request: Request) -> IpInfo:
+    return await get_ip_info(get_request_ip(request), request.headers.get('User-Agent'))
+
+
+@lru_cache(maxsize=settings.USER_AGENT_PARSE_CACHE_SIZE)
+def _parse_user_agent(user_agent: str) -> tuple[str, str, str]:
     _user_agent = parse(user_agent)
-    os = _user_agent.get_os()
-    browser = _user_agent.get_browser()
-    device = _user_agent.get_device()
+    return _user_agent.get_os(), _user_agent.get_browser(), _user_agent.get_device()
+
+
+def parse_user_agent(user_agent: str | None) -> UserAgentInfo:
+    """
+    Parse a user agent string, known agents are served from an in-process LRU
+
+    A few hundred distinct strings make up nearly all the traffic: the regex parsing only runs on a miss.
+
+    :param user_agent:
+    :return:
+    """
+    misses = _parse_user_agent.cache_info().misses
+    os, browser, device = _parse_user_agent(user_agent or '')
+    USER_AGENT_PARSE_CACHE.labels(result='miss' if _parse_user_agent.cache_info().misses > misses else 'hit').inc()
     return UserAgentInfo(user_agent=user_agent, device=device, os=os, browser=browser)
+
+
+def parse_user_agent_info(request: Request) -> UserAgentInfo:
+    return parse_user_agent(request.headers.get('User-Agent'))
+
+
+class RequestInfo:
+    """
+    Client information of a request, parsed only when read and at most once
+
+    The user agent is parsed on first access; the ip location is resolved by `location()`, meant to be
+    awaited by code running after the response (log writers), never on the response path.
+    """
+
+    def __init__(self, request: Request):
+        self.ip = get_request_ip(request)
+        self.user_agent = request.headers.get('User-Agent')
+        self._location: asyncio.Task | None = None
+
+    @cached_property
+    def user_agent_info(self) -> UserAgentInfo:
+        return parse_user_agent(self.user_agent)
+
+    @property
+    def os(self) -> str | None:
+        return self.user_agent_info.os
+
+    @property
+    def browser(self) -> str | None:
+        return self.user_agent_info.browser
+
+    @property
+    def device(self) -> str | None:
+        return self.user_agent_info.device
+
+    async def location(self) -> IpInfo:
+        """
+        Ip location, resolved once and shared by every reader of the request
+
+        :return:
+        """
+        if self._location is None:
+            self._location = asyncio.create_task(get_ip_info(self.ip, self.user_agent))
+        return await asyncio.shield(self._location)
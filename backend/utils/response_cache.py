@@ -0,0 +1,128 @@
+import hashlib
+
+from typing import Any, Awaitable, Callable
+
+from msgspec import json
+from redis.asyncio import Redis
+
+from backend.common.log import log
+from backend.database.db_redis import redis_client
+from backend.utils.singleflight import SingleFlight
+
+
+class GenerationCounter:
+    """
+    Redis counter incremented on every write to a data set
+
+    Readers derive cache keys and ETags from it instead of hashing the data.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+
+    async def get(self, redis: Redis | None = None) -> int:
+        """
+        Current generation
+
+        :param redis: Redis client, defaults to the global client
+        :return:
+        """
+        redis = redis or redis_client
+        return int(await redis.get(self.key) or 0)
+
+    async def bump(self, redis: Redis | None = None) -> None:
+        """
+        Start a new generation
+
+        :param redis: Redis client, defaults to the global client (pass a dedicated one outside the API event loop)
+        :return:
+        """
+        redis = redis or redis_client
+        try:
+            await redis.incr(self.key)
+        except Exception as e:
+            log.error(f'Generation counter bump failure ({self.key}): {e}')
+
+
+class ResponseCache:
+    """
+    Redis cache of pre-serialized (msgspec) JSON responses
+
+    Entries are keyed by a generation counter, so invalidating a whole namespace is a single INCR:
+    entries of older generations are never read again and simply expire.
+    Concurrent identical misses within a process share a single loader call.
+    """
+
+    def __init__(self, prefix: str, expire_seconds: int):
+        self.prefix = prefix
+        self.expire_seconds = expire_seconds
+        self.generation = GenerationCounter(f'{prefix}:generation')
+        self._singleflight: SingleFlight[bytes] = SingleFlight()
+
+    async def bump(self, redis: Redis | None = None) -> None:
+        """
+        Invalidate every cached entry of the namespace
+
+        :param redis: Redis client, defaults to the global client (pass a dedicated one outside the API event loop)
+        :return:
+        """
+        await self.generation.bump(redis)
+
+    def make_key(self, generation: int, name: str, params: dict[str, Any]) -> str:
+        """
+        Build a cache key from normalized parameters (unset values dropped, keys and sequences sorted)
+
+        :param generation:
+        :param name: Endpoint name
+        :param params: Request parameters
+        :return:
+        """
+        normalized = {
+            k: sorted(v) if isinstance(v, (list, tuple, set)) else v for k, v in sorted(params.items()) if v is not None
+        }
+        digest = hashlib.sha1(json.encode(normalized)).hexdigest()
+        return f'{self.prefix}:{generation}:{name}:{digest}'
+
+    async def key_for(self, name: str, params: dict[str, Any]) -> str | None:
+        """
+        Cache key of the current generation, None if Redis is unavailable
+
+        The key changes exactly when the cached content may change, so it doubles as an ETag seed.
+
+        :param name: Endpoint name
+        :param params: Request parameters
+        :return:
+        """
+        try:
+            return self.make_key(await self.generation.get(), name, params)
+        except Exception as e:
+            log.error(f'Response cache read failure ({self.prefix}): {e}')
+            return None
+
+    async def get_or_set(self, key: str | None, loader: Callable[[], Awaitable[Any]]) -> bytes | str:
+        """
+        Return the serialized response, calling the loader only on a cache miss
+
+        :param key: Key from `key_for`, None bypasses the cache
+        :param loader: Coroutine function returning the response content
+        :return: JSON document
+        """
+        if key is None:
+            return json.encode(await loader())
+        try:
+            cached = await redis_client.get(key)
+        except Exception as e:
+            log.error(f'Response cache read failure ({self.prefix}): {e}')
+            return json.encode(await loader())
+        if cached is not None:
+            return cached
+
+        return await self._singleflight.do(key, lambda: self._load(key, loader))
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> bytes:
+        content = json.encode(await loader())
+        try:
+            await redis_client.setex(key, self.expire_seconds, content)
+        except Exception as e:
+            log.error(f'Response cache write failure ({self.prefix}): {e}')
+        return content